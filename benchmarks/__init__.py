@@ -0,0 +1,8 @@
+"""
+Headless benchmarks. Run from the repository root:
+
+    python -m benchmarks --output results.json
+
+Every benchmark is measured with the SDL dummy video driver and compared
+against `benchmarks/baseline.json`.
+"""
@@ -0,0 +1,55 @@
+import argparse
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Headless benchmarks")
+    parser.add_argument("--output", default="bench_output.json")
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--threshold", type=float, default=0.5, help="allowed slowdown, 0.5 is 50%%")
+    parser.add_argument("--update-baseline", action="store_true")
+    parser.add_argument("--filter", default="", help="run only benchmarks whose name contains this")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    import pygame
+    pygame.init()
+    from benchmarks.runner import compare, load, save
+    from benchmarks.suite import BENCHMARKS
+    from game import Game
+    pygame.display.set_mode((Game.SCREEN_WIDTH, Game.SCREEN_HEIGHT))
+
+    results = []
+    for bench in BENCHMARKS:
+        if args.filter in bench.__name__:
+            results.extend(bench())
+    save(results, args.output)
+    if args.update_baseline:
+        save(results, args.baseline)
+        return 0
+    baseline = load(args.baseline) or {}
+    lines, regressed = compare(results, baseline, args.threshold)
+    for line in lines:
+        print(line)
+    errors = []
+    if args.filter in "allocations":
+        """ Budgets, not timings, so there is no baseline. The replay quits pygame on cleanup """
+        from benchmarks.allocations import check_session
+        states, errors = check_session()
+        for state in states.values():
+            print(state)
+        for error in errors:
+            print(error)
+    pygame.quit()
+    return 1 if regressed or errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,117 @@
+"""
+Bytes allocated by a frame, per `GameState`, over the recorded session.
+The frame loop should not allocate once a state is running: a frame is
+measured from the first event to the end of `render`, the frames that
+change the state are left out since a new state builds its objects.
+
+    python -m benchmarks.allocations
+
+Exits with 1 when a state goes over `FRAME_BUDGET`, or over
+`RETAINED_BUDGET` with what its frames keep. `python -m benchmarks`
+runs the same check after the timings.
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SESSION = os.path.join(ROOT, "benchmarks", "session.json")
+""" Bytes over the start of the frame, at its peak, for 95% of the frames of a state """
+FRAME_BUDGET = 1024
+""" Bytes kept by half of the frames, a card that changes piles grows its group """
+RETAINED_BUDGET = 128
+""" Frames of the end screen after the recording, it has none of its own """
+IDLE_FRAMES = 120
+
+
+class StateAllocations(object):
+    def __init__(self, name: str):
+        self.name = name
+        self.peaks: list = []
+        self.retained: list = []
+
+    def add(self, peak: int, retained: int) -> None:
+        self.peaks.append(peak)
+        self.retained.append(retained)
+
+    def percentile(self, values: list, p: float) -> int:
+        values = sorted(values)
+        return values[min(len(values) - 1, int(len(values) * p))]
+
+    def check(self, budget: int, retained: int = RETAINED_BUDGET) -> list:
+        """ Why the state is over budget, empty when it is not """
+        errors = []
+        if self.percentile(self.peaks, 0.95) > budget:
+            errors.append("{}: p95 peak over {} bytes".format(self.name, budget))
+        if self.percentile(self.retained, 0.5) > retained:
+            errors.append("{}: frames keep over {} bytes".format(self.name, retained))
+        return errors
+
+    def __str__(self) -> str:
+        return "{:<22} {:>6} frames  peak p50 {:>6} p95 {:>6} max {:>6}  retained p50 {:>5} total {:>7}".format(
+            self.name, len(self.peaks), self.percentile(self.peaks, 0.5), self.percentile(self.peaks, 0.95),
+            max(self.peaks), self.percentile(self.retained, 0.5), sum(self.retained))
+
+
+def measure_session(filename: str = SESSION, idle: int = IDLE_FRAMES) -> dict:
+    """ `StateAllocations` by state name. The events of a frame are decoded before it is measured """
+    import replay
+    recording = replay.Recording(filename)
+    frames = recording.frames + [[1000 // 60, []]] * idle
+    app = replay.ReplayApp(recording)
+    app.on_init()
+    states: dict = {}
+    tracemalloc.start()
+    try:
+        for time, data in frames:
+            events = [replay.decode(d) for d in data]
+            state = app.game.state
+            start = tracemalloc.get_traced_memory()[0]
+            tracemalloc.reset_peak()
+            for e in events:
+                app.on_event(e)
+            app.on_loop(time)
+            app.on_render()
+            size, peak = tracemalloc.get_traced_memory()
+            if app.game.state is not state:
+                continue
+            name = type(state).__name__
+            if name not in states:
+                states[name] = StateAllocations(name)
+            states[name].add(peak - start, size - start)
+    finally:
+        tracemalloc.stop()
+        app.on_cleanup()
+    return states
+
+
+def check_session(filename: str = SESSION, budget: int = FRAME_BUDGET) -> tuple:
+    """ The `StateAllocations` of the session and why they are over budget """
+    states = measure_session(filename)
+    errors = []
+    for state in states.values():
+        errors.extend(state.check(budget))
+    return states, errors
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description="Per frame allocations of every game state")
+    parser.add_argument("--session", default=SESSION)
+    parser.add_argument("--budget", type=int, default=FRAME_BUDGET, help="bytes per frame")
+    args = parser.parse_args()
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    os.chdir(ROOT)
+    sys.path.insert(0, ROOT)
+    states, errors = check_session(args.session, args.budget)
+    for state in states.values():
+        print(state)
+    for error in errors:
+        print(error)
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
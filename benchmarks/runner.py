@@ -0,0 +1,64 @@
+import json
+import time
+from typing import Callable, Optional
+
+
+class Result(object):
+    def __init__(self, name: str, value: float, unit: str, higher_is_better: bool = False):
+        self.name = name
+        self.value = value
+        self.unit = unit
+        self.higher_is_better = higher_is_better
+
+    def to_dict(self) -> dict:
+        return {"value": self.value, "unit": self.unit, "higher_is_better": self.higher_is_better}
+
+
+def measure(func: Callable, number: int = 1, repeat: int = 7) -> float:
+    """
+    Seconds of one call of `func`, the best of `repeat` rounds like
+    `timeit` does, since slower rounds are noise from the rest of the system.
+    """
+    best = float("inf")
+    for i in range(repeat):
+        start = time.perf_counter()
+        for j in range(number):
+            func()
+        best = min(best, (time.perf_counter() - start) / number)
+    return best
+
+
+def save(results: list, filename: str) -> None:
+    with open(filename, "w") as f:
+        json.dump({r.name: r.to_dict() for r in results}, f, indent=2, sort_keys=True)
+
+
+def load(filename: str) -> Optional[dict]:
+    try:
+        with open(filename) as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+def compare(results: list, baseline: dict, threshold: float) -> tuple:
+    """
+    Returns a line per benchmark and whether any of them is slower than
+    the baseline by more than `threshold` (0.5 is 50%).
+    """
+    lines = []
+    regressed = False
+    for r in results:
+        base = baseline.get(r.name)
+        if base is None or base["value"] == 0:
+            lines.append("{:<40} {:>12.4f} {:<8} (no baseline)".format(r.name, r.value, r.unit))
+            continue
+        change = r.value / base["value"] - 1
+        if r.higher_is_better:
+            change = -change
+        status = "ok"
+        if change > threshold:
+            status = "REGRESSION"
+            regressed = True
+        lines.append("{:<40} {:>12.4f} {:<8} {:>+7.1%} {}".format(r.name, r.value, r.unit, change, status))
+    return lines, regressed
@@ -0,0 +1,233 @@
+import os
+import subprocess
+import sys
+import time
+import pygame
+from pygame import Surface, transform
+from pygame.event import Event
+from pygame.locals import MOUSEBUTTONUP, SRCALPHA
+from benchmarks.runner import Result, measure
+from cards import Card, CardsImageFactory
+from graphics import Graphics, RenderQueue
+from rules import FACES, SUITES, Xeri, SimpleStrategy
+from tiled_parser import TiledParser
+import game
+import replay
+import selfplay
+
+MAP = "resources/deck01.json"
+TMX = "resources/deck01.tmx"
+SESSION = "benchmarks/session.json"
+PILE_SIZES: tuple = (0, 4, 16, 40)
+STATES: tuple = (
+    game.StartGameState,
+    game.DealCardsState,
+    game.DealTableState,
+    game.PlayGameState,
+    game.CollectWinningsState,
+    game.EndGameState,
+)
+
+
+def bench_tiled_parser() -> list:
+    return [
+        Result("tiled_parser.load", measure(lambda: TiledParser(MAP), 20) * 1000, "ms"),
+        Result("tiled_parser.load_tmx", measure(lambda: TiledParser(TMX), 20) * 1000, "ms"),
+    ]
+
+
+def bench_image_factory() -> list:
+    return [Result("cards_image_factory.create", measure(CardsImageFactory, 3) * 1000, "ms")]
+
+
+def fill_piles(start: game.StartGameState, factory: CardsImageFactory, size: int) -> None:
+    """ `size` cards on the table and on each player's captured pile """
+    back = factory.get_image(52)
+    for i in range(size * 3):
+        index = i % 52
+        card = Card(FACES[index % 13], SUITES[index // 13], factory.get_image(index), back, index)
+        if i < size:
+            card.rect.topleft = start.table.add_card(card)
+            card.show()
+            start.table.cards.add(card)
+        elif i < size * 2:
+            start.actor.put_on_deck(card)
+        else:
+            start.cpu.put_on_deck(card)
+
+
+def bench_state_render() -> list:
+    graphics = Graphics(game.Game.SCREEN_WIDTH, game.Game.SCREEN_HEIGHT)
+    surface = graphics.get_surface()
+    factory = CardsImageFactory()
+    results = []
+    for size in PILE_SIZES:
+        start = game.StartGameState()
+        fill_piles(start, factory, size)
+        for state_class in STATES:
+            if state_class is game.StartGameState:
+                state = start
+            else:
+                state = state_class(start.actor, start.cpu, start.table)
+            value = measure(lambda: state.render(surface), 200)
+            name = "render.{}.pile{}".format(state_class.__name__, size)
+            results.append(Result(name, value * 1000, "ms"))
+    return results
+
+
+def bench_blits(size: int = 40) -> list:
+    """
+    Blits/ms of every card on screen: one `blit` per sprite on SRCALPHA
+    converted, non RLE surfaces as the cards were made before, against the
+    batched `RenderQueue` on display format, RLE colorkeyed surfaces.
+    """
+    graphics = Graphics(game.Game.SCREEN_WIDTH, game.Game.SCREEN_HEIGHT)
+    surface = graphics.get_surface()
+    factory = CardsImageFactory()
+    start = game.StartGameState()
+    fill_piles(start, factory, size)
+    sprites = start.actor.on_hand.sprites() + start.actor.win_cards.sprites() + start.cpu.on_hand.sprites() + \
+        start.cpu.win_cards.sprites() + start.table.cards.sprites()
+    legacy = []
+    for s in sprites:
+        image = Surface(s.image.get_size(), SRCALPHA).convert()
+        image.set_colorkey(s.image.get_colorkey())
+        image.blit(s.image, (0, 0))
+        legacy.append((image, s.rect))
+    queue = RenderQueue()
+
+    def per_sprite() -> None:
+        for image, rect in legacy:
+            surface.blit(image, rect)
+
+    def batched() -> None:
+        queue.add_sprites(sprites)
+        queue.flush(surface)
+    return [
+        Result("blits.per_sprite", len(sprites) / measure(per_sprite, 200) / 1000, "blits/ms", True),
+        Result("blits.batched", len(sprites) / measure(batched, 200) / 1000, "blits/ms", True),
+    ]
+
+
+def bench_scaled_render(scale: float = 1.8) -> list:
+    """
+    A 1080p frame drawn with pre-scaled cards against a 800x600 frame
+    scaled up as a whole.
+    """
+    factory = CardsImageFactory()
+    size = (round(game.Game.SCREEN_WIDTH * scale), round(game.Game.SCREEN_HEIGHT * scale))
+    target = Surface(size)
+    small = game.StartGameState()
+    fill_piles(small, factory, 16)
+    scaled = game.StartGameState(None, None, scale)
+    fill_piles(scaled, CardsImageFactory(scale), 16)
+    surface = Surface((game.Game.SCREEN_WIDTH, game.Game.SCREEN_HEIGHT))
+
+    def whole_frame() -> None:
+        small.render(surface)
+        transform.scale(surface, size, target)
+    return [
+        Result("render.scaled.prescaled_cards", measure(lambda: scaled.render(target), 100) * 1000, "ms"),
+        Result("render.scaled.backbuffer", measure(whole_frame, 100) * 1000, "ms"),
+    ]
+
+
+def bench_deal() -> list:
+    """ Animated first deal, from the click on the deck until play starts """
+    g = game.Game(background=False)
+    g.update(0)
+    click = Event(MOUSEBUTTONUP, pos=g.state.table.table_deck.get_rect().center)
+    g.on_mouse_up(click)
+    frames = 0
+    start = time.perf_counter()
+    while not isinstance(g.state, game.PlayGameState):
+        g.update(1000 // 60)
+        g.render()
+        frames += 1
+    elapsed = time.perf_counter() - start
+    return [
+        Result("deal.animated", elapsed * 1000, "ms"),
+        Result("deal.frame", elapsed / frames * 1000, "ms"),
+    ]
+
+
+def bench_simulation(games: int = 2000) -> list:
+    strategy = SimpleStrategy()
+    x = Xeri()
+    start = time.perf_counter()
+    for seed in range(games):
+        x.reset(seed)
+        while not x.is_over():
+            x.play(strategy.choose(x.hands[x.turn], x))
+    elapsed = time.perf_counter() - start
+    return [Result("simulation.games", games / elapsed, "games/s", True)]
+
+
+def bench_simulation_tables(games: int = 500, rounds: int = 5) -> list:
+    """ Cost of a move as seats and decks are added, it should not grow with them. The best of `rounds` """
+    strategy = SimpleStrategy()
+    results = []
+    for players, decks in ((2, 1), (4, 1), (4, 2)):
+        x = Xeri(players=players, decks=decks)
+        best = float("inf")
+        for i in range(rounds):
+            moves = 0
+            start = time.perf_counter()
+            for seed in range(games):
+                x.reset(seed)
+                while not x.is_over():
+                    x.play(strategy.choose(x.hands[x.turn], x))
+                    moves += 1
+            best = min(best, (time.perf_counter() - start) / moves)
+        results.append(Result("simulation.move.p{}d{}".format(players, decks), best * 1e6, "us"))
+    return results
+
+
+def bench_selfplay(games: int = 256) -> list:
+    """ One env step is one move in one of the batched games """
+    return [Result("selfplay.steps", max(selfplay.steps_per_second(games) for i in range(3)), "steps/s", True)]
+
+
+def bench_replay() -> list:
+    """ End to end: a recorded session replayed without the frame limiter """
+    results = []
+    for render in (True, False):
+        run = replay.replay(SESSION, render)
+        name = "replay.session" if render else "replay.session.no_render"
+        results.append(Result(name, run["frames_per_sec"], "frames/s", True))
+    """ The replay quits pygame on cleanup """
+    pygame.init()
+    pygame.display.set_mode((game.Game.SCREEN_WIDTH, game.Game.SCREEN_HEIGHT))
+    return results
+
+
+def bench_startup(runs: int = 3) -> list:
+    """ Cold start of `main.py --profile-startup` in a new process """
+    best = {}
+    env = dict(os.environ, SDL_VIDEODRIVER="dummy", SDL_AUDIODRIVER="dummy")
+    for i in range(runs):
+        output = subprocess.run([sys.executable, "main.py", "--profile-startup"], env=env,
+                                capture_output=True, text=True, check=True).stdout
+        for line in output.splitlines():
+            parts = line.split(None, 1)
+            if len(parts) == 2 and parts[1] in ("first frame", "assets ready"):
+                best[parts[1]] = min(best.get(parts[1], float("inf")), float(parts[0]))
+    return [
+        Result("startup.first_frame", best["first frame"], "ms"),
+        Result("startup.assets_ready", best["assets ready"], "ms"),
+    ]
+
+
+BENCHMARKS: list = [
+    bench_tiled_parser,
+    bench_image_factory,
+    bench_state_render,
+    bench_blits,
+    bench_scaled_render,
+    bench_deal,
+    bench_simulation,
+    bench_simulation_tables,
+    bench_selfplay,
+    bench_replay,
+    bench_startup,
+]
@@ -0,0 +1,193 @@
+"""
+Records what the game draws. `FrameCapture` copies the back buffer of
+`Graphics` into a bounded queue and a thread encodes it, to a PNG
+sequence or an animated GIF. A full queue drops the frame instead of
+stalling the frame loop, a replay waits for the encoder instead.
+
+    python main.py --capture frames/
+    python replay.py benchmarks/session.json --capture game.gif
+"""
+import os
+import queue
+import struct
+import threading
+from typing import Optional
+from pygame import Surface, image
+
+
+class PngSequenceWriter(object):
+    """ frame00000.png, frame00001.png, ... in `directory` """
+    def __init__(self, directory: str):
+        self.directory = directory
+        self.frames: int = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def write(self, data: bytes, size: tuple, delay: int) -> None:
+        image.save(image.frombytes(data, size, "RGB"),
+                   os.path.join(self.directory, "frame{:05d}.png".format(self.frames)))
+        self.frames += 1
+
+    def close(self) -> None:
+        pass
+
+
+class GifWriter(object):
+    """
+    Animated GIF with NumPy: colors are mapped to a fixed 6x6x6 palette,
+    a frame only stores the rectangle that changed since the previous one
+    and the image data is written as 9 bit LZW literals with a clear code
+    every 254 of them, which any decoder reads and needs no dictionary.
+    """
+    LEVELS = 6
+    """ Frames per second by default, viewers slow down delays under 2 centiseconds """
+    FPS = 25
+    """ Literals between two clear codes, before the code size would grow """
+    RUN = 254
+
+    def __init__(self, filename: str, scale: int = 1):
+        import numpy
+        self.numpy = numpy
+        self.filename = filename
+        self.scale = scale
+        self.frames: int = 0
+        self.__file = None
+        self.__previous = None
+        self.__pending = None
+        """ Centiseconds lost to rounding, carried to the next frame """
+        self.__remainder: float = 0.0
+
+    def write(self, data: bytes, size: tuple, delay: int) -> None:
+        """ `delay` is the time since the previous frame, the frame before is written with it """
+        numpy = self.numpy
+        pixels = numpy.frombuffer(data, numpy.uint8).reshape(size[1], size[0], 3)[::self.scale, ::self.scale]
+        levels = (pixels.astype(numpy.uint16) * (self.LEVELS - 1) + 127) // 255
+        red, green, blue = levels[:, :, 0], levels[:, :, 1], levels[:, :, 2]
+        indexes = ((red * self.LEVELS + green) * self.LEVELS + blue).astype(numpy.uint8)
+        if self.__file is None:
+            self.__start(indexes.shape)
+        if self.__pending is not None:
+            self.__write_frame(self.__pending, delay)
+        self.__pending = indexes
+
+    def __start(self, shape: tuple) -> None:
+        self.__file = open(self.filename, "wb")
+        self.__file.write(b"GIF89a")
+        """ Global table of 256 colors: the 216 of the cube, the rest black """
+        self.__file.write(struct.pack("<HHBBB", shape[1], shape[0], 0xF7, 0, 0))
+        palette = bytearray(256 * 3)
+        for i in range(self.LEVELS ** 3):
+            r, g, b = i // (self.LEVELS * self.LEVELS), i // self.LEVELS % self.LEVELS, i % self.LEVELS
+            palette[i * 3:i * 3 + 3] = bytes(round(c * 255 / (self.LEVELS - 1)) for c in (r, g, b))
+        self.__file.write(bytes(palette))
+        """ Loop forever """
+        self.__file.write(b"\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00")
+
+    def __write_frame(self, indexes, delay: int) -> None:
+        numpy = self.numpy
+        top, left, bottom, right = 0, 0, indexes.shape[0], indexes.shape[1]
+        if self.__previous is not None:
+            changed = indexes != self.__previous
+            rows = numpy.flatnonzero(changed.any(axis=1))
+            columns = numpy.flatnonzero(changed.any(axis=0))
+            if len(rows) == 0:
+                """ Nothing changed, a single pixel holds the delay """
+                top, left, bottom, right = 0, 0, 1, 1
+            else:
+                top, bottom, left, right = rows[0], rows[-1] + 1, columns[0], columns[-1] + 1
+        self.__previous = indexes
+        centiseconds = delay / 10 + self.__remainder
+        self.__remainder = centiseconds - round(centiseconds)
+        f = self.__file
+        f.write(struct.pack("<BBBBHBB", 0x21, 0xF9, 4, 0x04, round(centiseconds), 0, 0))
+        f.write(struct.pack("<BHHHHB", 0x2C, left, top, right - left, bottom - top, 0))
+        f.write(b"\x08")
+        data = self.__encode(indexes[top:bottom, left:right].ravel())
+        for i in range(0, len(data), 255):
+            block = data[i:i + 255]
+            f.write(bytes([len(block)]))
+            f.write(block)
+        f.write(b"\x00")
+        self.frames += 1
+
+    def __encode(self, pixels) -> bytes:
+        numpy = self.numpy
+        clear, end = 256, 257
+        runs = (len(pixels) + self.RUN - 1) // self.RUN
+        codes = numpy.empty(len(pixels) + runs + 1, numpy.uint16)
+        literals = numpy.ones(len(pixels) + runs, bool)
+        literals[numpy.arange(runs) * (self.RUN + 1)] = False
+        codes[:-1][literals] = pixels
+        codes[:-1][~literals] = clear
+        codes[-1] = end
+        bits = ((codes[:, None] >> numpy.arange(9, dtype=numpy.uint16)) & 1).astype(numpy.uint8)
+        return numpy.packbits(bits.ravel(), bitorder="little").tobytes()
+
+    def close(self) -> None:
+        if self.__pending is not None:
+            self.__write_frame(self.__pending, 100)
+            self.__pending = None
+        if self.__file is not None:
+            self.__file.write(b"\x3b")
+            self.__file.close()
+
+
+def open_writer(output: str, scale: int = 1):
+    """ A GIF for a .gif file name, a PNG sequence in the directory `output` otherwise """
+    if output.lower().endswith(".gif"):
+        return GifWriter(output, scale)
+    return PngSequenceWriter(output)
+
+
+class FrameCapture(object):
+    """
+    `capture` runs on the frame loop and only copies the pixels, the
+    writer runs in a thread. Without `block`, a frame that finds the
+    queue full is dropped and its time goes to the next captured one.
+    """
+    QUEUE_SIZE = 32
+
+    def __init__(self, writer, fps: Optional[float] = None, block: bool = False, queue_size: int = QUEUE_SIZE):
+        self.writer = writer
+        self.interval: float = 0 if fps is None else 1000 / fps
+        self.block = block
+        self.captured: int = 0
+        self.dropped: int = 0
+        self.__queue: queue.Queue = queue.Queue(queue_size)
+        self.__last: Optional[int] = None
+        self.__error: Optional[BaseException] = None
+        self.__thread = threading.Thread(target=self.__encode, daemon=True)
+        self.__thread.start()
+
+    def capture(self, surface: Surface, now: int) -> None:
+        """ `now` is the game clock in ms """
+        if self.__error is not None:
+            raise self.__error
+        if self.__last is not None and now - self.__last < self.interval:
+            return
+        if not self.block and self.__queue.full():
+            self.dropped += 1
+            return
+        delay = 0 if self.__last is None else now - self.__last
+        self.__queue.put((image.tobytes(surface, "RGB"), surface.get_size(), delay))
+        self.__last = now
+        self.captured += 1
+
+    def __encode(self) -> None:
+        """ After an error the queue is still emptied, so a blocked `capture` goes on and raises it """
+        while True:
+            frame = self.__queue.get()
+            if frame is None:
+                return
+            if self.__error is None:
+                try:
+                    self.writer.write(*frame)
+                except BaseException as e:
+                    self.__error = e
+
+    def close(self) -> None:
+        """ Waits for the queued frames to be written """
+        self.__queue.put(None)
+        self.__thread.join()
+        self.writer.close()
+        if self.__error is not None:
+            raise self.__error
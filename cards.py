@@ -1,11 +1,15 @@
-from graphics import ImageFactory, SpriteSheet
-from pygame import Surface, Rect
+from graphics import ImageFactory, RenderQueue, SpriteSheet, ScaledImageCache
+from pygame import Surface, Rect, draw
 from pygame.math import Vector2
 from pygame.event import Event
 from pygame.sprite import Sprite, Group
-from tiled_parser import ObjectGroup
+from tiled_parser import ObjectGroup, TileItem
+from rules import FACES, SUITES, JACK, XERI, Rules, Score, Strategy, SimpleStrategy, table_cards
+import events
+from typing import Optional
 import random
 from math import ceil
+from typing import Callable
 
 
 def bresenham(x0, y0, x1, y1):
@@ -80,10 +84,20 @@ class CardsImageFactory(ImageFactory):
     """
     sprite: 71 x 96
     """
-    def __init__(self):
+    IMAGES = 65
+    """ Room for all images at two scales """
+    CACHE_SIZE = IMAGES * 2
+
+    def __init__(self, scale: float = 1, progress: Optional[Callable] = None):
+        """ `progress` is called with the fraction of images loaded """
         self.sheet = SpriteSheet(self.FILENAME, (0, 38, 0))
         self.images = []
+        self.scale = scale
+        self.progress = progress
         self.create()
+        """ The callback would keep the loading screen, and every state after it, alive """
+        self.progress = None
+        self.cache = ScaledImageCache(self.images, self.CACHE_SIZE)
 
     def create(self) -> None:
         width = 71
@@ -98,29 +112,54 @@ class CardsImageFactory(ImageFactory):
                         height
                     )
                 )
+                if self.progress is not None:
+                    self.progress(len(self.images) / self.IMAGES)
 
     def get_image(self, index: int) -> Surface:
-        return self.images[index]
+        return self.cache.get(index, self.scale)
+
+
+""" The 5x5 hit box under the mouse, moved around instead of a new Rect per test """
+POINTER = Rect(0, 0, 5, 5)
+
+
+def pointer(pos: tuple) -> Rect:
+    POINTER.topleft = pos
+    return POINTER
 
 
 class Card(Sprite):
-    def __init__(self, face: str, suite: str, image: Surface, back: Surface):
+    def __init__(self, face: str, suite: str, image: Surface, back: Surface, index: int = 0):
         super().__init__()
         self.face: str = face
         self.suite: str = suite
+        self.index: int = index
         self.face_image = image
-        self.image = back
         self.rect = image.get_rect()
+        self.image = back
         self.back = back
         self.path: list = []
         self.steer = None
         self.target = None
+        """ Hand slot of the player the card was dealt to, it keeps it until played """
+        self.slot: Optional[int] = None
+
+    @property
+    def image(self) -> Surface:
+        return self.__image
+
+    @image.setter
+    def image(self, image: Surface) -> None:
+        self.__image = image
+        """ What `RenderQueue` blits, built when the image changes instead of every frame """
+        self.blit_item: tuple = (image, self.rect)
 
     def move_to(self, target: tuple) -> None:
         self.target = target
 
     def is_dealed(self) -> bool:
-        return self.rect.topleft == self.target
+        target = self.target
+        return target is not None and self.rect.left == target[0] and self.rect.top == target[1]
 
     def update(self, time: int):
         if self.target is not None:
@@ -135,32 +174,112 @@ class Card(Sprite):
                 new_y = -1 if new_y < 0 else 1
             self.rect.top += new_y
 
+    def set_images(self, image: Surface, back: Surface) -> None:
+        """ New face and back images, the card stays face up or down """
+        shown = self.image is self.face_image
+        self.face_image = image
+        self.back = back
+        self.image = image if shown else back
+        self.rect.size = self.image.get_size()
+
+    def move_by(self, dx: int, dy: int) -> None:
+        """ Moves the card and where it is heading """
+        self.rect.move_ip(dx, dy)
+        if self.target is not None:
+            self.target = (self.target[0] + dx, self.target[1] + dy)
+
     def flip(self) -> None:
         self.image = self.back
 
+    def reset(self, topleft: tuple) -> None:
+        """ Back in the deck, face down """
+        self.image = self.back
+        self.rect.topleft = topleft
+        self.target = None
+
     def show(self) -> None:
         self.image = self.face_image
 
 
+class CardGroup(Group):
+    """
+    A `Group` iterated in place, `Group` copies its sprites to a list on
+    every loop. Change it while looping over `sprites()` instead.
+    """
+    def __iter__(self):
+        return iter(self.spritedict)
+
+    def __reversed__(self):
+        return reversed(self.spritedict)
+
+    def at(self, index: int) -> Card:
+        for card in self.spritedict:
+            if index == 0:
+                return card
+            index -= 1
+        raise IndexError("No card at {}".format(index))
+
+
+def move_cards(cards: list, old: TileItem, new: TileItem) -> None:
+    """ Cards laid out from `old` follow it to `new` """
+    dx = new.get_rect().left - old.get_rect().left
+    dy = new.get_rect().top - old.get_rect().top
+    if dx != 0 or dy != 0:
+        for card in cards:
+            card.move_by(dx, dy)
+
+
 class Table(object):
-    def __init__(self, objectgroup: ObjectGroup):
+    def __init__(self, objectgroup: ObjectGroup, seed: Optional[int] = None,
+                 factory: Optional[CardsImageFactory] = None, rules: Rules = XERI, decks: int = 1):
         self.objectgroup = objectgroup
-        self.cards: Group = Group()
-        self.deck: DeckOfCards = DeckOfCards()
+        self.rules: Rules = rules
+        self.cards: CardGroup = CardGroup()
+        self.deck: DeckOfCards = DeckOfCards(objectgroup.get_scale(), factory, rules, decks)
+        self.spacing: int = round(20 * objectgroup.get_scale())
         self.table_deck = self.objectgroup.get_item("table_deck")
-        self.deck.build(self.table_deck.get_rect().topleft)
+        self.seed: Optional[int] = seed
+        self.deck.build(self.table_deck.get_rect().topleft, seed)
+        """ The players in seat order and the seat on turn, seat 0 leads every round """
+        self.seats: list = []
+        self.turn: int = 0
         self.current_card: int = 0
+        self.seen: list = [0] * 13
+        """ Indexes of the played cards in order, enough to replay the game with its seed """
+        self.played: list = []
         self.__last_card: Card = None
+        self.__last_played: Card = None
         self.__compare_cards: list = []
         self.__winning_player: Player = None
         self.__last_winner: Player = None
-        self.__is_bonus_win = False
+        """ Points of the pending bonus capture, 0 for a plain one """
+        self.__bonus: int = 0
+
+    def reset(self, seed: Optional[int] = None) -> None:
+        """ A new deal with the cards already built, every card goes back to the deck """
+        self.seed = seed
+        self.cards.empty()
+        self.deck.reset(self.table_deck.get_rect().topleft, seed)
+        self.current_card = 0
+        self.turn = 0
+        self.seen[:] = [0] * 13
+        self.played.clear()
+        self.__last_card = None
+        self.__last_played = None
+        self.__compare_cards = []
+        self.__winning_player = None
+        self.__last_winner = None
+        self.__bonus = 0
 
-    def deal(self, actor: 'Player', cpu: 'Player') -> None:
-        self.deck.deal(actor, cpu)
+    def lead(self) -> None:
+        """ Seat 0 plays first """
+        self.turn = 0
+        self.seats[0].turn()
 
-    def initial_deal(self) -> None:
-        self.deck.initial_deal(self)
+    def pass_turn(self) -> None:
+        """ The turn goes round the seats """
+        self.turn = (self.turn + 1) % len(self.seats)
+        self.seats[self.turn].turn()
 
     def has_winner(self) -> bool:
         return self.__winning_player is not None
@@ -168,7 +287,8 @@ class Table(object):
     def add_card(self, card: Card) -> tuple:
         item = self.objectgroup.get_item('table')
         self.__last_card = card
-        return (item.get_rect().left + (self.get_cards() * 20), item.get_rect().top)
+        self.seen[card.index % 13] += 1
+        return (item.get_rect().left + (self.get_cards() * self.spacing), item.get_rect().top)
 
     def place_card(self, card: Card) -> tuple:
         item = self.objectgroup.get_item('table')
@@ -178,6 +298,9 @@ class Table(object):
     def add_to_compare(self, card: Card) -> None:
         self.__compare_cards = [self.__last_card, card]
         self.__last_card = card
+        self.__last_played = card
+        self.seen[card.index % 13] += 1
+        self.played.append(card.index)
 
     def last_card_dealed(self) -> bool:
         for card in self.cards:
@@ -186,42 +309,70 @@ class Table(object):
         return True
 
     def get_cards(self) -> int:
-        return len(self.cards.sprites())
+        return len(self.cards)
 
     def is_empty(self) -> bool:
-        return len(self.cards.sprites()) == 0
+        return len(self.cards) == 0
 
     def get_last_card(self) -> Card:
         return self.__last_card
 
+    def get_last_played(self) -> Card:
+        return self.__last_played
+
+    def top(self) -> Optional[int]:
+        """ The card a `rules.Strategy` has to beat """
+        if self.__last_card is None:
+            return None
+        return self.__last_card.index
+
+    def pile_size(self) -> int:
+        return self.get_cards()
+
     def update(self, time: int, plr: 'Player') -> None:
         if self.check_for_win():
             self.__winning_player = plr
+            events.emit(events.CAPTURE, plr.seat, self.__last_card.index, self.get_cards())
+            if self.__bonus > 0:
+                events.emit(events.XERI, plr.seat, self.__last_card.index, self.__bonus)
 
     def plr_collect_last_cards(self) -> None:
         self.__winning_player = self.__last_winner
+        if self.__last_winner is not None:
+            events.emit(events.CAPTURE, self.__last_winner.seat, events.NO_CARD, self.get_cards())
 
     def collect_winnings(self) -> None:
-        if len(self.cards.sprites()) == 0:
+        if len(self.cards) == 0:
             self.__last_winner = self.__winning_player
             self.__winning_player = None
             self.__last_card = None
             self.__compare_cards = []
             return
-        if self.__is_bonus_win is True:
+        if self.__bonus > 0:
             """ Bonus"""
-            card = self.cards.sprites()[0]
+            card = self.cards.at(0)
             self.__winning_player.put_on_bonus(card)
+            self.__winning_player.score.add_xeri(self.__bonus, card.face == JACK)
+            self.__winning_player.score.add(card.index)
             self.cards.remove(card)
-            self.__is_bonus_win = False
+            self.__bonus = 0
             return
-        card = self.cards.sprites()[0]
+        card = self.cards.at(0)
         self.__winning_player.put_on_deck(card)
+        self.__winning_player.score.add(card.index)
         self.cards.remove(card)
 
-    def draw(self, surface: Surface):
-        self.cards.draw(surface)
-        self.deck.draw(surface)
+    def enqueue(self, queue: RenderQueue) -> None:
+        queue.add_sprites(self.cards)
+        self.deck.enqueue(queue)
+
+    def relayout(self, objectgroup: ObjectGroup) -> None:
+        old = self.objectgroup
+        self.objectgroup = objectgroup
+        self.spacing = round(20 * objectgroup.get_scale())
+        self.table_deck = objectgroup.get_item("table_deck")
+        move_cards(self.cards.sprites(), old.get_item("table"), objectgroup.get_item("table"))
+        self.deck.relayout(old.get_item("table_deck"), self.table_deck)
 
     def check_for_win(self) -> bool:
         if len(self.__compare_cards) != 2:
@@ -231,28 +382,50 @@ class Table(object):
         last: Card = self.__compare_cards[1]
         if pre is None or last is None:
             return False
-        if pre.face == last.face or last.face == "Jack":
+        i = pre.index % 13 * 13 + last.index % 13
+        if self.rules.capture[i] == 1:
             result = True
-            if len(self.cards.sprites()) == 2 and pre.face == last.face:
-                self.__is_bonus_win = True
+            if len(self.cards) - 1 == 1:
+                self.__bonus = self.rules.bonus[i]
         self.__compare_cards = []
         return result
 
 
 class Player(object):
-    def __init__(self, objectgroup: ObjectGroup):
-        self.on_hand: Group = Group()
+    """ Milliseconds the seat waits on its turn before it plays, `game.PlayGameState` keeps them """
+    DELAY = 0
+
+    def __init__(self, objectgroup: ObjectGroup, rules: Rules = XERI):
+        self.on_hand: CardGroup = CardGroup()
         self.current_deck_index: int = 0
         self.card_to_play: Card = None
         self.objectgroup = objectgroup
-        self.win_cards: Group = Group()
-        self.bonus_cards: Group = Group()
+        self.win_cards: CardGroup = CardGroup()
+        self.bonus_cards: CardGroup = CardGroup()
+        self.score: Score = Score(rules)
+        """ Seat 0 is dealt first and leads every round """
+        self.seat: int = 0
+        self.selected: Optional[int] = None
+        self.spacing: int = round(20 * objectgroup.get_scale())
+        """ Outline of the selected card, moved instead of inflating a new Rect every frame """
+        self.__outline: Rect = Rect(0, 0, 0, 0)
         self.__played = False
         self.__turn = False
 
     def played(self) -> bool:
         return self.__played
 
+    def reset(self) -> None:
+        """ Empty hands and a zero score for a rematch, the cards belong to the deck again """
+        self.on_hand.empty()
+        self.win_cards.empty()
+        self.bonus_cards.empty()
+        self.score.reset()
+        self.card_to_play = None
+        self.selected = None
+        self.__played = False
+        self.__turn = False
+
     def turn(self) -> None:
         self.__turn = True
         self.__played = False
@@ -261,31 +434,62 @@ class Player(object):
         return self.__turn
 
     def update(self, time: int, mouse_event: Event) -> None:
-        if mouse_event is None:
+        if mouse_event is None or self.is_playing():
             return
-        for s in self.on_hand.sprites():
-            if s.rect.colliderect(Rect(mouse_event.pos, (5, 5))):
+        for s in self.on_hand:
+            if s.rect.colliderect(pointer(mouse_event.pos)):
                 self.card_to_play = s
                 return
 
-    def draw(self, surface: Surface):
-        self.on_hand.draw(surface)
-        if len(self.bonus_cards.sprites()) > 0:
-            copy = self.bonus_cards.sprites()
-            copy.reverse()
-            for s in copy:
-                surface.blit(s.image, s.rect)
-        if len(self.win_cards.sprites()) > 0:
-            self.win_cards.draw(surface)
+    def enqueue(self, queue: RenderQueue) -> None:
+        queue.add_sprites(self.on_hand)
+        queue.add_sprites(reversed(self.bonus_cards))
+        queue.add_sprites(self.win_cards)
+
+    def relayout(self, objectgroup: ObjectGroup) -> None:
+        """ Every card keeps its slot, wherever the slot is in `objectgroup` """
+        old = self.objectgroup
+        self.objectgroup = objectgroup
+        self.spacing = round(20 * objectgroup.get_scale())
+        for card in self.on_hand:
+            move_cards([card], old.get_items()[card.slot], objectgroup.get_items()[card.slot])
+        move_cards(self.win_cards.sprites() + self.bonus_cards.sprites(), old.get_item("deck"),
+                   objectgroup.get_item("deck"))
+
+    def draw_selection(self, surface: Surface) -> None:
+        if self.selected is not None and self.cards_on_hand() > 0:
+            card = self.on_hand.at(min(self.selected, self.cards_on_hand() - 1))
+            self.__outline.update(card.rect)
+            self.__outline.inflate_ip(6, 6)
+            draw.rect(surface, (255, 255, 0), self.__outline, 3)
 
     def take_card(self, card: Card) -> tuple:
-        index = self.cards_on_hand()
-        item = self.objectgroup.get_items()[index]
+        card.slot = self.cards_on_hand()
+        item = self.objectgroup.get_items()[card.slot]
         card.show()
         return item.get_rect().topleft
 
     def cards_on_hand(self) -> int:
-        return len(self.on_hand.sprites())
+        return len(self.on_hand)
+
+    def move_selection(self, step: int) -> None:
+        cards = self.cards_on_hand()
+        if cards == 0:
+            return
+        if self.selected is None:
+            self.selected = 0
+            return
+        self.selected = (min(self.selected, cards - 1) + step) % cards
+
+    def is_playing(self) -> bool:
+        """ The card to play has left the hand and is on its way to the table, it can not change """
+        return self.card_to_play is not None and not self.on_hand.has(self.card_to_play)
+
+    def play_selected(self) -> None:
+        cards = self.cards_on_hand()
+        if self.selected is None or cards == 0 or self.is_playing():
+            return
+        self.card_to_play = self.on_hand.at(min(self.selected, cards - 1))
 
     def play(self, time: int, table: Table) -> None:
         if self.card_to_play is None:
@@ -300,6 +504,7 @@ class Player(object):
         self.card_to_play.update(time)
         if self.card_to_play.is_dealed():
             table.add_to_compare(self.card_to_play)
+            events.emit(events.PLAYED, self.seat, self.card_to_play.index)
             self.card_to_play = None
             self.__played = True
             self.__turn = False
@@ -310,14 +515,23 @@ class Player(object):
         card.flip()
 
     def put_on_bonus(self, card: Card) -> None:
-        bonus_cards = len(self.bonus_cards.sprites()) + 1
+        bonus_cards = len(self.bonus_cards) + 1
         card.rect.topleft = self.objectgroup.get_item("deck").get_rect().topleft
-        card.rect.left += (bonus_cards * 20)
+        card.rect.left += (bonus_cards * self.spacing)
         self.bonus_cards.add(card)
-        self.bonus_cards.sprites().reverse()
 
 
 class Cpu(Player):
+    """ A rematch is dealt locally, the opponents over the network keep their game on the other side """
+    REMATCH = True
+    """ A pause before the move, so the card of the seat before can be seen """
+    DELAY = 400
+
+    def __init__(self, objectgroup: ObjectGroup, strategy: Optional[Strategy] = None, rules: Rules = XERI):
+        super().__init__(objectgroup, rules)
+        self.seat = 1
+        self.strategy: Strategy = strategy or SimpleStrategy()
+
     def take_card(self, card: Card) -> None:
         pos = super().take_card(card)
         card.flip()
@@ -325,49 +539,71 @@ class Cpu(Player):
 
     def play(self, time: int, table: Table) -> None:
         if self.card_to_play is None:
-            last = table.get_last_card()
-            for c in self.on_hand:
-                if last is None:
-                    self.card_to_play = c
-                    break
-                if c.face == last.face or c.face == "Jack":
-                    self.card_to_play = c
-                    break
-            if self.card_to_play is None:
-                self.card_to_play = self.on_hand.sprites()[0]
+            cards = self.on_hand.sprites()
+            self.card_to_play = cards[self.strategy.choose([c.index for c in cards], table)]
         super().play(time, table)
 
 
 class DeckOfCards(object):
+    """ Cards of one deck, `decks` of them are shuffled together """
     NUMBER_OF_CARDS = 52
 
-    def __init__(self):
-        self.__factory = CardsImageFactory()
+    def __init__(self, scale: float = 1, factory: Optional[CardsImageFactory] = None, rules: Rules = XERI,
+                 decks: int = 1):
+        self.__factory = factory or CardsImageFactory(scale)
+        self.rules: Rules = rules
+        self.decks: int = decks
+        self.__cards: list = []
         self.__deck: list = []
-        self.__sprites: Group = Group()
+        self.__sprites: CardGroup = CardGroup()
         self.__deal_finished = False
         self.__dealing_card: Card = None
+        """ Cards each seat gets this round and the seat being dealt to """
+        self.__round: Optional[int] = None
+        self.__seat: int = 0
 
-    def build(self, topleft: tuple) -> None:
-        face: list = ["Ace", "Deuce", "Three", "Four", "Five",
-                      "Six", "Seven", "Eight", "Nine", "Ten", "Jack", "Queen", "King"]
-        suite: list = ["Spades", "Hearts", "Clubs", "Diamonds"]
+    def build(self, topleft: tuple, seed: Optional[int] = None) -> None:
+        """ A seed gives the same order as `rules.Xeri` """
         back: Surface = self.__factory.get_image(52)
-        for i in range(self.NUMBER_OF_CARDS):
-            f = int(i % 13)
-            s = int(i / 13)
-            card = Card(face[f], suite[s], self.__factory.get_image(i), back)
+        for i in range(self.NUMBER_OF_CARDS * self.decks):
+            index = i % self.NUMBER_OF_CARDS
+            f = int(index % 13)
+            s = int(index / 13)
+            card = Card(FACES[f], SUITES[s], self.__factory.get_image(index), back, index)
             card.rect.topleft = topleft
+            self.__cards.append(card)
             self.__deck.append(card)
-        random.shuffle(self.__deck)
+        random.Random(seed).shuffle(self.__deck)
         for c in self.__deck:
             self.__sprites.add(c)
 
-    def draw(self, surface: Surface) -> None:
-        self.__sprites.draw(surface)
+    def reset(self, topleft: tuple, seed: Optional[int] = None) -> None:
+        """ Shuffles the built cards again, in the order `build` would for `seed` """
+        self.__deck[:] = self.__cards
+        random.Random(seed).shuffle(self.__deck)
+        self.__sprites.empty()
+        for c in self.__deck:
+            c.reset(topleft)
+            self.__sprites.add(c)
+        self.__dealing_card = None
+        self.__deal_finished = False
+
+    def enqueue(self, queue: RenderQueue) -> None:
+        queue.add_sprites(self.__sprites)
+
+    def relayout(self, old: TileItem, new: TileItem) -> None:
+        move_cards(self.__sprites.sprites(), old, new)
+
+    def set_factory(self, factory: CardsImageFactory) -> None:
+        """ Every card built by this deck, wherever it is now, takes its images from `factory` """
+        self.__factory = factory
+        back = factory.get_image(52)
+        for card in self.__cards:
+            card.set_images(factory.get_image(card.index), back)
 
     def start_deal(self):
         self.__deal_finished = False
+        self.__round = None
 
     def is_finished(self) -> bool:
         return self.__deal_finished
@@ -376,7 +612,7 @@ class DeckOfCards(object):
         return len(self.__deck) == 0
 
     def initial_deal(self, time: int, table: Table) -> None:
-        if table.get_cards() == 4:
+        if table.get_cards() == table_cards(self.rules.table_size, len(table.seats), self.decks):
             self.__deal_finished = True
             return
         if self.__dealing_card is None:
@@ -388,33 +624,35 @@ class DeckOfCards(object):
         if self.__dealing_card.is_dealed():
             table.cards.add(self.__dealing_card)
             self.__sprites.remove(self.__dealing_card)
+            events.emit(events.DEALT, events.NO_SEAT, self.__dealing_card.index)
             self.__dealing_card = None
 
-    def deal(self, time: int, actor: Player, cpu: Player) -> None:
-        if actor.cards_on_hand() == 6 and cpu.cards_on_hand() == 6:
+    def deal(self, time: int, seats: list) -> None:
+        """
+        Seat by seat, `seats[0]` first. The last rounds of a deck deal
+        fewer cards, the same to every seat as `rules.Xeri` does.
+        """
+        if self.__round is None:
+            self.__round = min(self.rules.hand_size, len(self.__deck) // len(seats))
+            self.__seat = 0
+        if seats[-1].cards_on_hand() == self.__round:
             self.__deal_finished = True
             return
-        """ Deal to actor """
-        if actor.cards_on_hand() < 6:
+        while self.__seat < len(seats):
+            player = seats[self.__seat]
+            if player.cards_on_hand() == self.__round:
+                self.__seat += 1
+                continue
             if self.__dealing_card is None:
                 self.__dealing_card = self.__deck.pop()
-                target = actor.take_card(self.__dealing_card)
+                target = player.take_card(self.__dealing_card)
                 self.__dealing_card.move_to(target)
             self.__dealing_card.update(time)
             if self.__dealing_card.is_dealed():
-                actor.on_hand.add(self.__dealing_card)
-                self.__sprites.remove(self.__dealing_card)
-                self.__dealing_card.target = None
-                self.__dealing_card = None
-        """ Deal to cpu """
-        if actor.cards_on_hand() == 6:
-            if self.__dealing_card is None:
-                self.__dealing_card = self.__deck.pop()
-                target = cpu.take_card(self.__dealing_card)
-                self.__dealing_card.move_to(target)
-            self.__dealing_card.update(time)
-            if self.__dealing_card.is_dealed():
-                cpu.on_hand.add(self.__dealing_card)
+                player.on_hand.add(self.__dealing_card)
                 self.__sprites.remove(self.__dealing_card)
+                events.emit(events.DEALT, player.seat, self.__dealing_card.index)
                 self.__dealing_card.target = None
                 self.__dealing_card = None
+            if player.cards_on_hand() < self.__round:
+                return
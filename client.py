@@ -0,0 +1,90 @@
+import json
+import socket
+from typing import Optional
+from cards import Card, Cpu, Player, Table
+from tiled_parser import ObjectGroup
+from server import encode
+
+
+class RemoteConnection(object):
+    """
+    Client side of the `server.py` protocol. Reads are non blocking so the
+    frame loop never waits on the network.
+    """
+    def __init__(self, host: str, port: int):
+        self.__socket = socket.create_connection((host, port))
+        self.__buffer = b""
+        self.seed: Optional[int] = None
+
+    def join(self) -> int:
+        self.send({"op": "join"})
+        self.__socket.setblocking(True)
+        while self.seed is None:
+            for message in self.__read():
+                if message["op"] == "joined":
+                    self.seed = message["seed"]
+        self.__socket.setblocking(False)
+        return self.seed
+
+    def send(self, message: dict) -> None:
+        self.__socket.sendall(encode(message))
+
+    def poll(self) -> list:
+        try:
+            return self.__read()
+        except BlockingIOError:
+            return []
+
+    def close(self) -> None:
+        """ The server may have closed the connection already """
+        try:
+            self.send({"op": "leave"})
+        except OSError:
+            pass
+        finally:
+            self.__socket.close()
+
+    def __read(self) -> list:
+        data = self.__socket.recv(4096)
+        if data == b"":
+            raise ConnectionError("Server closed the connection")
+        self.__buffer += data
+        lines = self.__buffer.split(b"\n")
+        self.__buffer = lines.pop()
+        return [json.loads(line) for line in lines]
+
+
+class RemoteCpu(Cpu):
+    """
+    The opponent is played by the server. The table shares the server's
+    seed, so both sides deal the same cards and only the played card has
+    to travel.
+    """
+    REMATCH = False
+    """ The move already waits on the network """
+    DELAY = 0
+
+    def __init__(self, objectgroup: ObjectGroup, connection: RemoteConnection):
+        super().__init__(objectgroup)
+        self.connection = connection
+        self.__waiting = False
+
+    def play(self, time: int, table: Table) -> None:
+        if self.card_to_play is None:
+            if self.__waiting is False:
+                played = table.get_last_played()
+                self.connection.send({"op": "play", "card": played.index})
+                self.__waiting = True
+            for message in self.connection.poll():
+                if message["op"] == "played" and message["seat"] == 1:
+                    self.card_to_play = self.find(message["card"])
+            if self.card_to_play is None:
+                return
+            self.__waiting = False
+        Player.play(self, time, table)
+
+    def find(self, index: int) -> Optional[Card]:
+        for c in self.on_hand:
+            if c.index == index:
+                return c
+        return None
@@ -2,9 +2,9 @@ from enum import Enum
 import pygame
 from pygame.event import Event
 from typing import Optional
-from pygame.joystick import Joystick, get_count
 from pygame.locals import K_LEFT, K_RIGHT, K_UP, K_DOWN, \
-    K_a, K_s, K_d, K_z, K_x, K_c, K_RETURN
+    K_a, K_s, K_d, K_z, K_x, K_c, K_SPACE, K_RETURN, KEYDOWN, KEYUP, \
+    JOYBUTTONDOWN, JOYBUTTONUP, JOYHATMOTION, JOYAXISMOTION, JOYDEVICEADDED, JOYDEVICEREMOVED
 
 
 class State(Enum):
@@ -27,45 +27,50 @@ class State(Enum):
     IDLE = 'idle'
 
 
+""" Every (x, y) of a direction mapped once to its state """
+DIRECTIONS: dict = {
+    (0, 0): State.IDLE,
+    (-1, 1): State.UPLEFT,
+    (1, 1): State.UPRIGHT,
+    (-1, -1): State.DOWNLEFT,
+    (1, -1): State.DOWNRIGHT,
+    (0, 1): State.UP,
+    (0, -1): State.DOWN,
+    (-1, 0): State.LEFT,
+    (1, 0): State.RIGHT,
+}
+
+
 class Direction(object):
 
     def __init__(self):
         self.x = 0
         self.y = 0
+        self.state: State = State.IDLE
 
-    def update(self, x: int, y: int) -> None:
+    def update(self, x: int, y: int) -> Optional[State]:
+        """ Returns the new direction when it has just changed to one """
         self.x = x
         self.y = y
+        state = DIRECTIONS[(x, y)]
+        if state is self.state:
+            return None
+        self.state = state
+        if state is State.IDLE:
+            return None
+        return state
 
     def get_active(self) -> Optional[str]:
-        for state, value in self.__states().items():
-            if value is True:
-                return state
+        return self.state
 
     def get(self, state: str) -> bool:
         '''
         Get the status of a state
         '''
-        states = self.__states()
-        if state in states:
-            return states.get(state)
-        return False
+        return self.state is state
 
     def is_idle(self) -> bool:
-        return self.x == 0 and self.y == 0
-
-    def __states(self):
-        return {
-            State.IDLE: self.x == 0 and self.y == 0,
-            State.UPLEFT: self.y == 1 and self.x == -1,
-            State.UPRIGHT: self.y == 1 and self.x == 1,
-            State.DOWNLEFT: self.y == -1 and self.x == -1,
-            State.DOWNRIGHT: self.y == -1 and self.x == 1,
-            State.UP: self.y == 1 and self.x == 0,
-            State.DOWN: self.y == -1 and self.x == 0,
-            State.LEFT: self.x == -1 and self.y == 0,
-            State.RIGHT: self.x == 1 and self.y == 0,
-        }
+        return self.state is State.IDLE
 
 
 class Buttons(object):
@@ -120,16 +125,20 @@ class AiInput(UserInput):
         self.button = Buttons()
 
 class Input(object):
+    """
+    Inputs are driven by pygame events. `on_event` returns the direction
+    or button that has just been activated, if any.
+    """
     def __init__(self):
         raise RuntimeError("Can not instatiate")
 
-    def key_down(self, e: Event) -> None:
+    def key_down(self, e: Event) -> Optional[State]:
         raise NotImplementedError("Implement `key_down` method.")
 
-    def key_up(self, e: Event) -> None:
+    def key_up(self, e: Event) -> Optional[State]:
         raise NotImplementedError("Implement `key_up` method.")
 
-    def on_event(self) -> None:
+    def on_event(self, e: Event) -> Optional[State]:
         raise NotImplementedError("Implement `on_event` method.")
 
     def get_direction(self) -> Direction:
@@ -143,10 +152,13 @@ class Input(object):
 
 
 class Joypad(Input):
-    def __init__(self):
+    DEADZONE = 0.5
+
+    def __init__(self, index: int = 0, instance_id: Optional[int] = None):
+        """ With `instance_id` the device is not opened, the pad follows its events alone like in a replay """
         self.joystick = None
         self.joystick_name = None
-        self.hats = []
+        self.instance_id = None
         self.direction = Direction()
         self.buttons = Buttons()
         self.button_maps = {
@@ -159,41 +171,50 @@ class Joypad(Input):
             8: State.SELECT,
             9: State.START
         }
-        if get_count() > 0:
-            joystick = Joystick(0)
+        self.axes: list = [0, 0]
+        if instance_id is not None:
+            self.instance_id = instance_id
+            return
+        from pygame.joystick import Joystick, get_count
+        if get_count() > index:
+            joystick = Joystick(index)
             joystick.init()
             self.joystick = joystick
             self.joystick_name = joystick.get_name()
-            self.hats = joystick.get_numhats()
-            self.axis = joystick.get_numaxes()
-
-    def key_down(self, e: Event) -> None:
-        pass
-
-    def key_up(self, e: Event) -> None:
-        pass
-
-    def on_event(self) -> None:
-        x = y = 0
-        for i in range(self.hats):
-            hat = self.joystick.get_hat(i)
-            x = hat[0]
-            y = hat[1]
-
-        if self.direction.is_idle():
-            jx = self.joystick.get_axis(0)
-            jy = self.joystick.get_axis(1)
-            x = int(jx)
-            y = int(round(jy, 0)) * -1
-
-        self.direction.update(x, y)
-        buttons = self.joystick.get_numbuttons()
-        for b in range(buttons):
-            button = self.joystick.get_button(b)
-            if button == 1:
-                self.buttons.pressed(self.button_maps.get(b))
-            else:
-                self.buttons.released(self.button_maps.get(b))
+            self.instance_id = joystick.get_instance_id()
+
+    def key_down(self, e: Event) -> Optional[State]:
+        button = self.button_maps.get(e.button)
+        if button is None:
+            return None
+        self.buttons.pressed(button)
+        return button
+
+    def key_up(self, e: Event) -> Optional[State]:
+        button = self.button_maps.get(e.button)
+        if button is not None:
+            self.buttons.released(button)
+        return None
+
+    def on_event(self, e: Event) -> Optional[State]:
+        if e.instance_id != self.instance_id:
+            return None
+        if e.type == JOYBUTTONDOWN:
+            return self.key_down(e)
+        if e.type == JOYBUTTONUP:
+            return self.key_up(e)
+        if e.type == JOYHATMOTION:
+            return self.direction.update(e.value[0], e.value[1])
+        if e.type == JOYAXISMOTION and e.axis < 2:
+            value = 0
+            if e.value > self.DEADZONE:
+                value = 1
+            elif e.value < -self.DEADZONE:
+                value = -1
+            """ Axis y points down """
+            self.axes[e.axis] = value if e.axis == 0 else -value
+            return self.direction.update(self.axes[0], self.axes[1])
+        return None
 
     def get_direction(self) -> Direction:
         return self.direction
@@ -206,6 +227,13 @@ class Joypad(Input):
 
 
 class Keyboard(Input):
+    """ Arrow key to the axis and value it moves """
+    AXES: dict = {
+        K_LEFT: (0, -1),
+        K_RIGHT: (0, 1),
+        K_UP: (1, 1),
+        K_DOWN: (1, -1),
+    }
 
     def __init__(self):
         self.direction = Direction()
@@ -217,41 +245,39 @@ class Keyboard(Input):
             K_z: State.B,
             K_x: State.A,
             K_c: State.R,
+            K_SPACE: State.A,
             K_RETURN: State.START
         }
-        self.direction_maps = {
-            K_UP: State.UP,
-            K_DOWN: State.DOWN,
-            K_LEFT: State.LEFT,
-            K_RIGHT: State.RIGHT,
-        }
-
-    def key_down(self, e: Event) -> None:
-        if e.key in self.button_maps:
-            self.buttons.pressed(self.button_maps.get(e.key))
-
-    def key_up(self, e: Event) -> None:
-        if e.key in self.button_maps:
-            self.buttons.released(self.button_maps.get(e.key))
-
-    def on_event(self) -> None:
-        pressed = pygame.key.get_pressed()
-        x = y = 0
-
-        if pressed[K_RIGHT] == 1:
-            x = 1
-        if pressed[K_LEFT] == 1:
-            x = -1
-        if pressed[K_UP] == 1:
-            y = 1
-        if pressed[K_DOWN] == 1:
-            y = -1
-        if pressed[K_RIGHT] == 0 and pressed[K_LEFT] == 0:
-            x = 0
-        if pressed[K_UP] == 0 and pressed[K_DOWN] == 0:
-            y = 0
-
-        self.direction.update(x, y)
+        self.axes: list = [0, 0]
+
+    def key_down(self, e: Event) -> Optional[State]:
+        axis = self.AXES.get(e.key)
+        if axis is not None:
+            self.axes[axis[0]] = axis[1]
+            return self.direction.update(self.axes[0], self.axes[1])
+        button = self.button_maps.get(e.key)
+        if button is None:
+            return None
+        self.buttons.pressed(button)
+        return button
+
+    def key_up(self, e: Event) -> Optional[State]:
+        axis = self.AXES.get(e.key)
+        if axis is not None:
+            if self.axes[axis[0]] == axis[1]:
+                self.axes[axis[0]] = 0
+            return self.direction.update(self.axes[0], self.axes[1])
+        button = self.button_maps.get(e.key)
+        if button is not None:
+            self.buttons.released(button)
+        return None
+
+    def on_event(self, e: Event) -> Optional[State]:
+        if e.type == KEYDOWN:
+            return self.key_down(e)
+        if e.type == KEYUP:
+            return self.key_up(e)
+        return None
 
     def get_direction(self) -> Direction:
         return self.direction
@@ -264,22 +290,42 @@ class Keyboard(Input):
 
 
 class Controller(Input):
+    """
+    Keyboard and joypad together, the last one used is the active input.
+    A joypad is opened when pygame reports it, also when plugged later.
+    """
+    KEY_EVENTS: tuple = (KEYDOWN, KEYUP)
+    JOY_EVENTS: tuple = (JOYBUTTONDOWN, JOYBUTTONUP, JOYHATMOTION, JOYAXISMOTION)
 
     def __init__(self):
-        keyboard = Keyboard()
-        joypad = Joypad()
-        if joypad.joystick is None:
-            joypad = None
-        self.input = joypad or keyboard
-
-    def key_down(self, e: Event) -> None:
-        self.input.key_down(e)
-
-    def key_up(self, e: Event) -> None:
-        self.input.key_up(e)
-
-    def on_event(self) -> None:
-        self.input.on_event()
+        self.keyboard = Keyboard()
+        self.joypad: Optional[Joypad] = None
+        self.input: Input = self.keyboard
+
+    def key_down(self, e: Event) -> Optional[State]:
+        return self.input.key_down(e)
+
+    def key_up(self, e: Event) -> Optional[State]:
+        return self.input.key_up(e)
+
+    def on_event(self, e: Event) -> Optional[State]:
+        if e.type in self.KEY_EVENTS:
+            self.input = self.keyboard
+            return self.keyboard.on_event(e)
+        if e.type in self.JOY_EVENTS:
+            if self.joypad is None:
+                return None
+            self.input = self.joypad
+            return self.joypad.on_event(e)
+        if e.type == JOYDEVICEADDED and self.joypad is None:
+            joypad = Joypad(e.device_index, getattr(e, "instance_id", None))
+            if joypad.instance_id is not None:
+                self.joypad = joypad
+        elif e.type == JOYDEVICEREMOVED and self.joypad is not None and \
+                e.instance_id == self.joypad.instance_id:
+            self.joypad = None
+            self.input = self.keyboard
+        return None
 
     def get_direction(self) -> Direction:
         return self.input.get_direction()
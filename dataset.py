@@ -0,0 +1,233 @@
+"""
+Append only, columnar store of played games. Every column is a flat file
+of one NumPy dtype, read back with `numpy.memmap`, so queries scan the
+moves in chunks without loading them.
+
+    python dataset.py simulate games/ --games 100000 --strategies greedy simple
+    python dataset.py summary games/
+"""
+import argparse
+import json
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Optional
+import numpy
+from rules import Xeri
+from policy import STRATEGIES
+
+VERSION = 1
+META = "meta.json"
+""" One row per move: the card, the seat that played it, the cards on the table before it and the points after it """
+MOVE_COLUMNS: dict = {
+    "card": numpy.uint8,
+    "seat": numpy.uint8,
+    "move": numpy.uint8,
+    "pile": numpy.uint8,
+    "captured": numpy.bool_,
+    "xeri": numpy.bool_,
+    "points0": numpy.int16,
+    "points1": numpy.int16,
+}
+""" One row per game, `start` is the row of its first move """
+GAME_COLUMNS: dict = {
+    "start": numpy.uint64,
+    "moves": numpy.uint16,
+    "seed": numpy.int64,
+    "total0": numpy.int16,
+    "total1": numpy.int16,
+}
+""" Keys `Dataset.rate` can group by, with the number of groups """
+GROUPS: dict = {"face": 13, "suite": 4, "seat": 2, "move": 48, "pile": 52}
+CHUNK = 1 << 22
+
+
+def play(seed: int, strategies: list) -> tuple:
+    """ Plays a deal with `rules.Xeri` and returns its move rows and final totals """
+    game = Xeri(seed)
+    rows = []
+    while not game.is_over():
+        seat = game.turn
+        pile = game.pile_size()
+        card, captured, xeri = game.play(strategies[seat].choose(game.hands[seat], game))
+        rows.append((card, seat, game.moves - 1, pile, captured, xeri,
+                     game.scores[0].points, game.scores[1].points))
+    return rows, game.totals()
+
+
+def replay(seed: int, cards: list) -> tuple:
+    """ Move rows of a game known by its seed and the cards played in order, e.g. `cards.Table.played` """
+    game = Xeri(seed)
+    rows = []
+    for card in cards:
+        seat = game.turn
+        pile = game.pile_size()
+        card, captured, xeri = game.play(game.hands[seat].index(card))
+        rows.append((card, seat, game.moves - 1, pile, captured, xeri,
+                     game.scores[0].points, game.scores[1].points))
+    return rows, game.totals()
+
+
+class DatasetWriter(object):
+    """
+    Buffers games and appends them column by column. The row counts in
+    `meta.json` are replaced last, so a reader never sees a partial write.
+    """
+    BUFFER = 1 << 16
+
+    def __init__(self, path: str):
+        self.path = path
+        os.makedirs(path, exist_ok=True)
+        self.meta: dict = read_meta(path)
+        self.__moves: list = []
+        self.__games: list = []
+
+    def add(self, seed: int, rows: list, totals: list) -> None:
+        start = self.meta["moves"] + len(self.__moves)
+        self.__games.append((start, len(rows), seed, totals[0], totals[1]))
+        self.__moves.extend(rows)
+        if len(self.__moves) >= self.BUFFER:
+            self.flush()
+
+    def flush(self) -> None:
+        if len(self.__games) == 0:
+            return
+        self.__append(MOVE_COLUMNS, self.__moves, self.meta["moves"])
+        self.__append(GAME_COLUMNS, self.__games, self.meta["games"])
+        self.meta["moves"] += len(self.__moves)
+        self.meta["games"] += len(self.__games)
+        temporary = os.path.join(self.path, META + ".tmp")
+        with open(temporary, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(temporary, os.path.join(self.path, META))
+        self.__moves = []
+        self.__games = []
+
+    def close(self) -> None:
+        self.flush()
+
+    def __append(self, columns: dict, rows: list, count: int) -> None:
+        for i, (name, dtype) in enumerate(columns.items()):
+            with open(os.path.join(self.path, name + ".bin"), "r+b" if count > 0 else "wb") as f:
+                """ Bytes after the committed rows are left over from an interrupted write """
+                f.seek(count * numpy.dtype(dtype).itemsize)
+                f.truncate()
+                numpy.fromiter((row[i] for row in rows), dtype, len(rows)).tofile(f)
+
+
+def read_meta(path: str) -> dict:
+    filename = os.path.join(path, META)
+    if not os.path.exists(filename):
+        return {"version": VERSION, "moves": 0, "games": 0}
+    with open(filename) as f:
+        meta = json.load(f)
+    if meta["version"] != VERSION:
+        raise ValueError("Unsupported dataset version {}".format(meta["version"]))
+    return meta
+
+
+class Dataset(object):
+    def __init__(self, path: str):
+        self.path = path
+        self.meta: dict = read_meta(path)
+        self.moves: dict = {name: self.__map(name, dtype, self.meta["moves"]) for name, dtype in MOVE_COLUMNS.items()}
+        self.games: dict = {name: self.__map(name, dtype, self.meta["games"]) for name, dtype in GAME_COLUMNS.items()}
+
+    def __map(self, name: str, dtype, count: int) -> numpy.ndarray:
+        if count == 0:
+            return numpy.zeros(0, dtype)
+        return numpy.memmap(os.path.join(self.path, name + ".bin"), dtype, "r", shape=(count,))
+
+    def __len__(self) -> int:
+        return self.meta["moves"]
+
+    def key(self, group: str, start: int, end: int) -> numpy.ndarray:
+        if group == "face":
+            return self.moves["card"][start:end] % 13
+        if group == "suite":
+            return self.moves["card"][start:end] // 13
+        return self.moves[group][start:end]
+
+    def rate(self, column: str = "captured", by: tuple = ("face",)) -> tuple:
+        """
+        How often `column` is set for every combination of the `by` groups.
+        Returns (rate, count) arrays shaped by the groups, rate is NaN where
+        count is 0.
+        """
+        shape = tuple(GROUPS[group] for group in by)
+        size = int(numpy.prod(shape))
+        counts = numpy.zeros(size, numpy.int64)
+        hits = numpy.zeros(size, numpy.int64)
+        for start in range(0, len(self), CHUNK):
+            end = min(len(self), start + CHUNK)
+            index = numpy.zeros(end - start, numpy.int64)
+            for group in by:
+                index = index * GROUPS[group] + self.key(group, start, end)
+            counts += numpy.bincount(index, minlength=size)
+            hits += numpy.bincount(index[self.moves[column][start:end]], minlength=size)
+        with numpy.errstate(invalid="ignore", divide="ignore"):
+            rate = hits / counts
+        return rate.reshape(shape), counts.reshape(shape)
+
+    def first_player_advantage(self) -> dict:
+        """ Seat 0 leads every round """
+        difference = self.games["total0"].astype(numpy.int32) - self.games["total1"]
+        games = len(difference)
+        return {
+            "games": games,
+            "points": float(difference.mean()) if games else 0.0,
+            "wins": float((difference > 0).mean()) if games else 0.0,
+            "ties": float((difference == 0).mean()) if games else 0.0,
+        }
+
+
+def simulate(first: str, second: str, seeds: range) -> list:
+    strategies = [STRATEGIES[first](), STRATEGIES[second]()]
+    return [(seed,) + play(seed, strategies) for seed in seeds]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Columnar store of played games")
+    commands = parser.add_subparsers(dest="command", required=True)
+    sim = commands.add_parser("simulate", help="append simulated games")
+    sim.add_argument("path")
+    sim.add_argument("--games", type=int, default=10000)
+    sim.add_argument("--strategies", nargs=2, default=["greedy", "greedy"], metavar=("SEAT0", "SEAT1"))
+    sim.add_argument("--first-seed", type=int, default=None, help="continues after the stored games by default")
+    sim.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    sim.add_argument("--batch", type=int, default=1000, help="games per task")
+    summary = commands.add_parser("summary", help="capture rates and the first player advantage")
+    summary.add_argument("path")
+    args = parser.parse_args()
+
+    if args.command == "simulate":
+        for name in args.strategies:
+            if name not in STRATEGIES:
+                parser.error("unknown strategy " + name)
+        writer = DatasetWriter(args.path)
+        first = writer.meta["games"] if args.first_seed is None else args.first_seed
+        batches = [range(seed, min(first + args.games, seed + args.batch))
+                   for seed in range(first, first + args.games, args.batch)]
+        with ProcessPoolExecutor(args.workers) as pool:
+            for games in pool.map(simulate, [args.strategies[0]] * len(batches),
+                                  [args.strategies[1]] * len(batches), batches):
+                for seed, rows, totals in games:
+                    writer.add(seed, rows, totals)
+        writer.close()
+        print("{} games, {} moves in {}".format(writer.meta["games"], writer.meta["moves"], args.path))
+        return
+
+    dataset = Dataset(args.path)
+    print("{} games, {} moves".format(dataset.meta["games"], len(dataset)))
+    rate, count = dataset.rate("captured", ("face",))
+    print("capture rate by face: " + " ".join("{:.3f}".format(r) for r in rate))
+    rate, count = dataset.rate("captured", ("pile",))
+    print("capture rate by cards on table: " + " ".join("{}:{:.3f}".format(i, r)
+                                                        for i, r in enumerate(rate) if count[i] > 0))
+    rate, count = dataset.rate("xeri", ("face",))
+    print("xeri rate by face: " + " ".join("{:.3f}".format(r) for r in rate))
+    for key, value in dataset.first_player_advantage().items():
+        print("first player {}: {}".format(key, round(value, 3) if isinstance(value, float) else value))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,242 @@
+"""
+What happens in a game as a stream of small typed events: cards dealt
+and played, captures, xeri, state transitions and frame times.
+
+`emit` is called from the hot paths and costs a global lookup when no
+consumer is attached. With consumers the events go to a preallocated
+ring buffer of int columns and are handed out once per frame by `tick`.
+
+    python main.py --events game.csv --log-events
+    python replay.py benchmarks/session.json --events session.jsonl
+"""
+import csv
+import json
+import sys
+from array import array
+from typing import NamedTuple, Optional, TextIO
+
+DEALT = 0
+PLAYED = 1
+CAPTURE = 2
+XERI = 3
+STATE = 4
+FRAME = 5
+KINDS: tuple = ("dealt", "played", "capture", "xeri", "state", "frame")
+""" Seat of the events of the table and the frame loop """
+NO_SEAT = -1
+NO_CARD = -1
+
+
+class Event(NamedTuple):
+    """
+    `value` by kind: the cards taken by a capture, the points of a xeri,
+    the `state_name` id of the new state and the frame time in µs.
+    """
+    kind: int
+    time: int
+    seat: int
+    card: int
+    value: int
+
+    @property
+    def name(self) -> str:
+        return KINDS[self.kind]
+
+    def detail(self) -> str:
+        """ `value` readable, the name of the state for a transition """
+        if self.kind == STATE:
+            return state_name(self.value)
+        return str(self.value)
+
+
+__states: list = []
+__state_ids: dict = {}
+
+
+def state_id(name: str) -> int:
+    """ Interned id of a state class name, the `value` of a STATE event """
+    if name not in __state_ids:
+        __state_ids[name] = len(__states)
+        __states.append(name)
+    return __state_ids[name]
+
+
+def state_name(state: int) -> str:
+    return __states[state]
+
+
+class EventRing(object):
+    """
+    Fixed columns written in place, nothing is allocated per event. When
+    the readers fall behind by `capacity` events the oldest are lost and
+    counted.
+    """
+    CAPACITY = 1024
+
+    def __init__(self, capacity: int = CAPACITY):
+        self.capacity = capacity
+        self.kinds = array("b", bytes(capacity))
+        self.times = array("q", bytes(8 * capacity))
+        self.seats = array("b", bytes(capacity))
+        self.cards = array("h", bytes(2 * capacity))
+        self.values = array("q", bytes(8 * capacity))
+        """ Events ever written and the first one not read yet """
+        self.head: int = 0
+        self.tail: int = 0
+        self.lost: int = 0
+
+    def push(self, kind: int, time: int, seat: int, card: int, value: int) -> None:
+        i = self.head % self.capacity
+        self.kinds[i] = kind
+        self.times[i] = time
+        self.seats[i] = seat
+        self.cards[i] = card
+        self.values[i] = value
+        self.head += 1
+        if self.head - self.tail > self.capacity:
+            self.tail += 1
+            self.lost += 1
+
+    def drain(self) -> list:
+        """ The unread events, oldest first """
+        events = []
+        for n in range(self.tail, self.head):
+            i = n % self.capacity
+            events.append(Event(self.kinds[i], self.times[i], self.seats[i], self.cards[i], self.values[i]))
+        self.tail = self.head
+        return events
+
+    def __len__(self) -> int:
+        return self.head - self.tail
+
+
+class EventConsumer(object):
+    """ Receives every event in order, once per frame """
+    def __init__(self):
+        raise RuntimeError("Can not instatiate")
+
+    def on_event(self, event: Event) -> None:
+        raise NotImplementedError("Implement `on_event` method.")
+
+    def close(self) -> None:
+        pass
+
+
+class EventBus(object):
+    def __init__(self, capacity: int = EventRing.CAPACITY):
+        self.ring = EventRing(capacity)
+        self.consumers: list = []
+        """ Game clock in ms, set by `tick` """
+        self.now: int = 0
+
+    def emit(self, kind: int, seat: int, card: int, value: int) -> None:
+        self.ring.push(kind, self.now, seat, card, value)
+
+    def dispatch(self) -> None:
+        if len(self.ring) == 0:
+            return
+        for event in self.ring.drain():
+            for consumer in self.consumers:
+                consumer.on_event(event)
+
+
+BUS: Optional[EventBus] = None
+
+
+def attach(consumer: EventConsumer, capacity: int = EventRing.CAPACITY) -> EventBus:
+    """ The bus is created with its first consumer """
+    global BUS
+    if BUS is None:
+        BUS = EventBus(capacity)
+    BUS.consumers.append(consumer)
+    return BUS
+
+
+def detach(consumer: EventConsumer) -> None:
+    """ The pending events still reach `consumer`, the bus goes away with the last one """
+    global BUS
+    if BUS is None or consumer not in BUS.consumers:
+        return
+    BUS.dispatch()
+    BUS.consumers.remove(consumer)
+    consumer.close()
+    if len(BUS.consumers) == 0:
+        BUS = None
+
+
+def close() -> None:
+    """ Delivers the pending events and closes every consumer """
+    while BUS is not None:
+        detach(BUS.consumers[-1])
+
+
+def emit(kind: int, seat: int = NO_SEAT, card: int = NO_CARD, value: int = 0) -> None:
+    if BUS is None:
+        return
+    BUS.emit(kind, seat, card, value)
+
+
+def tick(now: int) -> None:
+    """ Once per frame: the events so far go to the consumers, the next ones happen at `now` """
+    if BUS is None:
+        return
+    BUS.dispatch()
+    BUS.now = now
+
+
+class EventLog(EventConsumer):
+    """ One line per event, frame times are left out unless `frames` """
+    def __init__(self, stream: TextIO = sys.stdout, frames: bool = False):
+        self.stream = stream
+        self.frames = frames
+
+    def on_event(self, event: Event) -> None:
+        if event.kind == FRAME and not self.frames:
+            return
+        self.stream.write("{:>9} {:<8} seat {:>2} card {:>3} {}\n".format(
+            event.time, event.name, event.seat, event.card, event.detail()))
+
+
+class EventExport(EventConsumer):
+    """ Every event as a CSV row when the file ends with .csv, a JSON line otherwise """
+    COLUMNS: tuple = ("time", "event", "seat", "card", "value")
+
+    def __init__(self, filename: str):
+        self.filename = filename
+        self.__file = open(filename, "w", newline="")
+        self.__csv = None
+        if filename.endswith(".csv"):
+            self.__csv = csv.writer(self.__file)
+            self.__csv.writerow(self.COLUMNS)
+
+    def on_event(self, event: Event) -> None:
+        row = (event.time, event.name, event.seat, event.card, event.detail() if event.kind == STATE else event.value)
+        if self.__csv is not None:
+            self.__csv.writerow(row)
+        else:
+            self.__file.write(json.dumps(dict(zip(self.COLUMNS, row)), separators=(',', ':')) + "\n")
+
+    def close(self) -> None:
+        self.__file.close()
+
+
+class EventTally(EventConsumer):
+    """
+    Counts per seat: cards played, captures, cards taken and xeri points,
+    the running score of a game from the events alone.
+    """
+    def __init__(self):
+        self.played: dict = {}
+        self.captures: dict = {}
+        self.taken: dict = {}
+        self.xeri: dict = {}
+
+    def on_event(self, event: Event) -> None:
+        seat = event.seat
+        if event.kind == PLAYED:
+            self.played[seat] = self.played.get(seat, 0) + 1
+        elif event.kind == CAPTURE:
+            self.captures[seat] = self.captures.get(seat, 0) + 1
+            self.taken[seat] = self.taken.get(seat, 0) + event.value
+        elif event.kind == XERI:
+            self.xeri[seat] = self.xeri.get(seat, 0) + event.value
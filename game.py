@@ -1,48 +1,246 @@
 from __future__ import annotations
-from pygame import Rect, Surface, mouse, SYSTEM_CURSOR_ARROW, SYSTEM_CURSOR_HAND
-from graphics import Graphics
-from cards import Player, Table, Cpu
+from pygame import Rect, Surface, draw, mouse, error, SYSTEM_CURSOR_ARROW, SYSTEM_CURSOR_HAND
+from graphics import Graphics, GlyphAtlas, RenderQueue
+from cards import Player, Table, Cpu, CardsImageFactory, pointer
 from tiled_parser import TiledParser, Map
 from pygame.event import Event
 from pygame.cursors import Cursor
+import random
+import threading
+from typing import Optional, TYPE_CHECKING
+from startup import phase
+from profiler import FrameProfiler, PHASES, UPDATE, RENDER, PRESENT
+from controls import State
+from policy import STRATEGIES
+from rules import VARIANTS, Score
+from scheduler import Scheduler, Timer
+import events
+
+if TYPE_CHECKING:
+    from capture import FrameCapture
+    from client import RemoteConnection
+    from hotreload import HotReloader
+
+
+MAP_FILE = "resources/deck01.tmx"
+""" Object groups of the map in seat order, the turn goes counterclockwise """
+SEATS: dict = {
+    2: ("PLAYER", "CPU"),
+    3: ("PLAYER", "RIGHT", "CPU"),
+    4: ("PLAYER", "RIGHT", "CPU", "LEFT"),
+}
+""" Label and position of the score of each seat, by its object group """
+SCORE_LABELS: dict = {
+    "PLAYER": ("YOU", (640, 560)),
+    "CPU": ("CPU", (640, 20)),
+    "RIGHT": ("RIGHT", (688, 480)),
+    "LEFT": ("LEFT", (16, 115)),
+}
+
+
+HAND_CURSOR = Cursor(SYSTEM_CURSOR_HAND)
+ARROW_CURSOR = Cursor(SYSTEM_CURSOR_ARROW)
+
+
+def set_cursor(cursor: Cursor) -> None:
+    """ The dummy video driver of headless runs has no system cursors """
+    try:
+        mouse.set_cursor(cursor)
+    except error:
+        pass
 
 
-class Timer(object):
-    def __init__(self, delay: int):
-        self.delay: int = delay
-        self.counter: int = 0
-
-    def completed(self, time: int):
-        self.counter += time
-        if self.counter >= self.delay:
-            return True
-        return False
-
-    def looped(self, time: int):
-        self.counter += time
-        if self.counter >= self.delay:
-            self.counter = 0
-            return True
-        return False
+class ScoreHud(object):
+    """
+    Live scores, the text is rebuilt only when a score changes. Partners
+    share one `Score`, so both show the total of the team.
+    """
+    """ Digits of a total, the blits of every digit at every place are laid out once """
+    PLACES = 4
+    """ Index of the blank in the digits of a place, a total with fewer places shows it """
+    BLANK = 10
+
+    def __init__(self, scale: float = 1, size: int = 28):
+        self.glyphs = GlyphAtlas(size, (255, 255, 255))
+        self.labels: dict = {name: (label, (round(pos[0] * scale), round(pos[1] * scale)))
+                             for name, (label, pos) in SCORE_LABELS.items()}
+        self.__seats: list = None
+        self.__points: int = -1
+        self.__most_cards: Optional[Score] = None
+        self.__most_clubs: Optional[Score] = None
+        self.__items: list = []
+        """ Per seat: the index of its first digit in `__items`, the blits of its digits and its total """
+        self.__starts: list = []
+        self.__digits: list = []
+        self.__totals: list = []
+
+    def draw(self, surface: Surface, seats: list) -> int:
+        """
+        A total changes with the points, which only grow in a game, and with
+        the score that has more cards or clubs than every other. Most
+        collected cards change neither, and a total that changes puts blits
+        laid out before in place, so a frame creates no text.
+        """
+        points = 0
+        cards = -1
+        clubs = -1
+        most_cards = None
+        most_clubs = None
+        for player in seats:
+            score = player.score
+            points += score.points
+            if score.cards > cards:
+                cards = score.cards
+                most_cards = score
+            elif score.cards == cards and score is not most_cards:
+                most_cards = None
+            if score.clubs > clubs:
+                clubs = score.clubs
+                most_clubs = score
+            elif score.clubs == clubs and score is not most_clubs:
+                most_clubs = None
+        if seats is not self.__seats:
+            self.__seats = seats
+            self.__layout(seats)
+            self.__points = -1
+        if points != self.__points or most_cards is not self.__most_cards or most_clubs is not self.__most_clubs:
+            self.__points = points
+            self.__most_cards = most_cards
+            self.__most_clubs = most_clubs
+            seat = 0
+            for player in seats:
+                """ `Score.total` without the generator of the other scores """
+                score = player.score
+                total = score.points
+                if score is most_cards:
+                    total += score.rules.most_cards
+                if score is most_clubs:
+                    total += score.rules.most_suite_points
+                if total != self.__totals[seat]:
+                    self.__set_total(seat, total)
+                seat += 1
+        surface.blits(self.__items, False)
+        return len(self.__items)
+
+    def __layout(self, seats: list) -> None:
+        """ The digits of the font are all as wide as a 0, so each place has a fixed position """
+        width = self.glyphs.rects["0"].width
+        self.__items = []
+        self.__starts = []
+        self.__digits = []
+        self.__totals = [-1] * len(seats)
+        for p in seats:
+            label, (x, y) = self.labels[p.objectgroup.get_name()]
+            self.__items.extend(self.glyphs.layout(label + " ", (x, y)))
+            x += sum(self.glyphs.rects[c].width for c in label + " ")
+            digits = [[self.glyphs.layout(c, (x + place * width, y))[0] for c in "0123456789 "]
+                      for place in range(self.PLACES)]
+            self.__starts.append(len(self.__items))
+            self.__items.extend(place[self.BLANK] for place in digits)
+            self.__digits.append(digits)
+
+    def __set_total(self, seat: int, total: int) -> None:
+        """ Puts the blits of the digits of `total` after the label """
+        self.__totals[seat] = total
+        items = self.__items
+        digits = self.__digits[seat]
+        start = self.__starts[seat]
+        power = 1
+        places = 1
+        while total >= power * 10 and places < self.PLACES:
+            power *= 10
+            places += 1
+        place = 0
+        while place < self.PLACES:
+            items[start + place] = digits[place][total // power % 10 if place < places else self.BLANK]
+            power //= 10
+            place += 1
+
+
+class DebugOverlay(object):
+    """ Rolling frame timings of `FrameProfiler`, refreshed a few times per second """
+    CHARS = "0123456789abcdefghijklmnopqrstuvwxyzABCDEFGHIJKLMNOPQRSTUVWXYZ :./%"
+    REFRESH = 500
+
+    def __init__(self, profiler: FrameProfiler):
+        self.profiler = profiler
+        self.glyphs = GlyphAtlas(20, (255, 255, 0), self.CHARS)
+        self.lines: list = []
+        self.__items: list = []
+
+    def refresh(self) -> None:
+        frames = list(self.profiler.frames)
+        average = sum(frames) / len(frames) if len(frames) > 0 else 0
+        fps = 1 / average if average > 0 else 0
+        self.lines = [
+            self.profiler.state + "  " + str(round(fps)) + " fps  " + str(self.profiler.blits) + " blits",
+            "phase  p50 / p95 / p99 ms"
+        ]
+        for name in PHASES:
+            values = self.profiler.percentiles(name)
+            self.lines.append(name + "  " + " / ".join("%.2f" % (v * 1000) for v in values))
+        self.__items = []
+        y = 4
+        for line in self.lines:
+            self.__items.extend(self.glyphs.layout(line, (4, y)))
+            y += self.glyphs.atlas.get_height()
+
+    def draw(self, surface: Surface) -> int:
+        surface.blits(self.__items, False)
+        return len(self.__items)
 
 
 class Game(object):
     SCREEN_WIDTH = 800
     SCREEN_HEIGHT = 600
 
-    def __init__(self):
-        self.graphics = Graphics(self.SCREEN_WIDTH, self.SCREEN_HEIGHT)
+    def __init__(self, connection: Optional['RemoteConnection'] = None, seed: Optional[int] = None,
+                 scale: float = 1, background: bool = True, strategy: str = "simple", variant: str = "xeri",
+                 players: int = 2, decks: int = 1, partnership: bool = False):
+        """
+        Everything is laid out for 800x600 and drawn at `scale`.
+        With `background` the assets load in a thread behind a loading screen.
+        `strategy` names the Cpu players in `policy.STRATEGIES` and `variant`
+        the rules in `rules.VARIANTS`. `players` seats of `SEATS` share
+        `decks` decks, with `partnership` the seats across are a team.
+        """
+        self.scale = scale
+        with phase("display"):
+            self.graphics = Graphics(round(self.SCREEN_WIDTH * scale), round(self.SCREEN_HEIGHT * scale))
         self.__debug = False
-        self.state = StartGameState()
+        """ Delayed callbacks of the states and the cards, on the clock of `update` """
+        self.scheduler = Scheduler()
+        self.state = LoadingState(connection, seed, scale, background, strategy, variant, players, decks, partnership)
+        self.state.enter(self.scheduler)
+        self.hud = ScoreHud(scale, round(28 * scale))
+        self.profiler = FrameProfiler()
+        self.debug_overlay: Optional[DebugOverlay] = None
+        self.__debug_timer: Optional[Timer] = None
         self.mouse_up_event = None
         self.mouse_pos: tuple = (0, 0)
+        self.actions: list = []
+        self.reloader: Optional['HotReloader'] = None
+        self.capture: Optional['FrameCapture'] = None
 
     def update(self, time: int) -> None:
         """ Get the next state of the game """
-        self.state = self.state.get_state()
+        state = self.state.get_state()
+        if state is not self.state:
+            events.emit(events.STATE, value=events.state_id(type(state).__name__))
+            self.state.leave()
+            state.enter(self.scheduler)
+            self.state = state
+        self.scheduler.advance(time)
+        events.tick(self.scheduler.now)
+        if self.reloader is not None:
+            self.reloader.update(self.state)
+        for action in self.actions:
+            self.state.on_input(action)
+        self.actions.clear()
         """ Update the state of sprites, level, etc """
         self.state.update(time, self.mouse_up_event, self.mouse_pos)
         self.mouse_up_event = None
+        self.profiler.mark(UPDATE)
 
     def on_mouse_up(self, event: Event) -> None:
         self.mouse_up_event = event
@@ -50,15 +248,83 @@ class Game(object):
     def on_mouse_move(self, event: Event) -> None:
         self.mouse_pos = event.pos
 
+    def on_input(self, action: State) -> None:
+        """ A direction or button from `controls.Controller` """
+        self.actions.append(action)
+
+    def watch(self) -> None:
+        """ Reload the map and the card sheet when they change on disk """
+        from hotreload import HotReloader
+        self.reloader = HotReloader(MAP_FILE, self.scale)
+        self.scheduler.every(HotReloader.INTERVAL, lambda: self.reloader.poll(self.state))
+
+    def start_capture(self, output: str, fps: Optional[float] = None, block: bool = False) -> None:
+        """ Every frame drawn from now on goes to a PNG sequence or a .gif, see `capture.py` """
+        from capture import FrameCapture, open_writer
+        writer = open_writer(output)
+        self.capture = FrameCapture(writer, fps or getattr(writer, "FPS", None), block)
+
+    def stop_capture(self) -> Optional['FrameCapture']:
+        """ Waits for the encoder and returns the capture, for its counters """
+        capture = self.capture
+        if capture is not None:
+            self.capture = None
+            capture.close()
+        return capture
+
+    def is_loading(self) -> bool:
+        return isinstance(self.state.get_state(), LoadingState)
+
+    def is_over(self) -> bool:
+        return isinstance(self.state.get_state(), EndGameState)
+
+    def is_idle(self) -> bool:
+        """ Nothing changes on screen until an input or a timer """
+        return self.state.get_state().IDLE
+
+    def next_wakeup(self) -> Optional[int]:
+        return self.scheduler.next_wakeup()
+
+    def get_table(self) -> Optional[Table]:
+        return getattr(self.state.get_state(), "table", None)
+
     def render(self) -> None:
-        self.state.render(self.graphics.get_surface())
+        surface = self.graphics.get_surface()
+        blits = self.state.render(surface) or 0
+        if self.state.HUD is True:
+            blits += self.hud.draw(surface, self.state.seats())
+        if self.__debug is True:
+            blits += self.debug_overlay.draw(surface)
+        self.profiler.mark(RENDER)
         self.graphics.render()
+        if self.capture is not None:
+            self.capture.capture(surface, self.scheduler.now)
+        self.profiler.mark(PRESENT)
+        self.profiler.end(type(self.state).__name__, blits + 1)
+        if events.BUS is not None:
+            events.emit(events.FRAME, value=round(self.profiler.frames.last * 1000000))
 
     def toggle_debug(self) -> None:
-        self.state.toggle_debug()
+        self.__debug = not self.__debug
+        if self.__debug is False:
+            self.__debug_timer.cancel()
+            return
+        if self.debug_overlay is None:
+            self.debug_overlay = DebugOverlay(self.profiler)
+        self.debug_overlay.refresh()
+        self.__debug_timer = self.scheduler.every(DebugOverlay.REFRESH, self.debug_overlay.refresh)
 
 
 class GameState(object):
+    """ Draw the scores and the cards of every seat and `table` """
+    HUD = True
+    """ The loop may sleep between inputs """
+    IDLE = False
+    """ Shared by the states, it is empty between frames """
+    queue: RenderQueue = RenderQueue()
+    """ The clock of `Game`, given by `enter` to the state that becomes current """
+    scheduler: Optional[Scheduler] = None
+
     def __init__(self):
         raise RuntimeError("Can not instatiate")
 
@@ -71,18 +337,46 @@ class GameState(object):
     def get_state(self) -> GameState:
         raise NotImplementedError("Implement `get_state` method.")
 
+    def on_input(self, action: State) -> None:
+        pass
+
+    def enter(self, scheduler: Scheduler) -> None:
+        """ Called by `Game` before the first `update` of the state, its timers go on `scheduler` """
+        self.scheduler = scheduler
+
+    def leave(self) -> None:
+        """ Called by `Game` when the state is left, for the timers it still has """
+        pass
+
+    def seats(self) -> list:
+        """ The players in seat order, the actor leads unless a lockstep peer hosts the game """
+        return self.table.seats
+
+    def draw_cards(self, surface: Surface) -> int:
+        """ Every card on screen in one batched blit, returns the number of blits """
+        surface.fill((0, 38, 0))
+        for player in self.table.seats:
+            player.enqueue(self.queue)
+        self.table.enqueue(self.queue)
+        blits = self.queue.flush(surface)
+        self.actor.draw_selection(surface)
+        return blits
+
 
 class PlayGameState(GameState):
+    """ A seat with a `DELAY` waits that long on the game clock before it plays """
     def __init__(self, actor: Player, cpu: Player, table: Table):
         self.actor: Player = actor
         self.cpu: Player = cpu
         self.table: Table = table
-        self.timer = Timer(1000)
         self.state = None
+        self.__waited: bool = False
+        self.__timer: Optional[Timer] = None
 
     def update(self, time: int, mouse_up_event: Event, mouse_pos: tuple) -> None:
-        if self.actor.cards_on_hand() == 0 and self.cpu.cards_on_hand() == 0 and \
-                self.table.last_card_dealed():
+        seats = self.seats()
+        """ Every seat gets the same cards and the last one plays the last card of a round """
+        if seats[-1].cards_on_hand() == 0 and self.table.last_card_dealed():
             if self.table.deck.is_empty() and self.table.is_empty():
                 self.state = EndGameState(self.actor, self.cpu, self.table)
                 return
@@ -93,57 +387,161 @@ class PlayGameState(GameState):
             self.state = DealCardsState(self.actor, self.cpu, self.table)
             return
         self.actor.update(time, mouse_up_event)
-        self.actor.play(time, self.table)
-        if self.actor.played():
-            self.cpu.turn()
-        self.table.update(time, self.actor)
-        if self.table.has_winner():
-            self.state = CollectWinningsState(self.actor, self.cpu, self.table)
-            return
-        if self.actor.played():
-            self.cpu.play(time, self.table)
-            if self.cpu.played():
-                self.actor.turn()
-        self.table.update(time, self.cpu)
-        if self.table.has_winner():
-            self.state = CollectWinningsState(self.actor, self.cpu, self.table)
-            return
+        """ Only the seat on turn plays, the next one goes on in the same frame until seat 0 leads again """
+        while True:
+            player = seats[self.table.turn]
+            if not self.ready(player):
+                return
+            player.play(time, self.table)
+            if player.played():
+                self.__waited = False
+                self.table.pass_turn()
+            self.table.update(time, player)
+            if self.table.has_winner():
+                self.state = CollectWinningsState(self.actor, self.cpu, self.table)
+                return
+            if not player.played() or self.table.turn == 0:
+                return
 
-    def render(self, surface: Surface) -> None:
-        surface.fill((0, 38, 0))
-        self.actor.draw(surface)
-        self.cpu.draw(surface)
-        self.table.draw(surface)
+    def on_input(self, action: State) -> None:
+        if action is State.LEFT:
+            self.actor.move_selection(-1)
+        elif action is State.RIGHT:
+            self.actor.move_selection(1)
+        elif action is State.A or action is State.START:
+            self.actor.play_selected()
+
+    def ready(self, player: Player) -> bool:
+        if player.DELAY == 0 or self.__waited:
+            return True
+        if self.__timer is None:
+            self.__timer = self.scheduler.after(player.DELAY, self.__wake)
+        return False
+
+    def __wake(self) -> None:
+        self.__waited = True
+        self.__timer = None
+
+    def leave(self) -> None:
+        if self.__timer is not None:
+            self.__timer.cancel()
+
+    def render(self, surface: Surface) -> int:
+        return self.draw_cards(surface)
 
     def get_state(self) -> GameState:
         if self.state is not None:
             return self.state
         return self
 
-    def toggle_debug(self) -> None:
-        self.view.toggle_debug()
+
+class LoadingState(GameState):
+    """
+    Builds the `StartGameState` in a thread, so the window shows up and
+    keeps responding while the map and the sprite sheet load.
+    """
+    HUD = False
+
+    def __init__(self, connection: Optional['RemoteConnection'] = None, seed: Optional[int] = None,
+                 scale: float = 1, background: bool = True, strategy: str = "simple", variant: str = "xeri",
+                 players: int = 2, decks: int = 1, partnership: bool = False):
+        self.connection = connection
+        self.seed = seed
+        self.strategy = strategy
+        self.variant = variant
+        self.players = players
+        self.decks = decks
+        self.partnership = partnership
+        self.scale = scale
+        self.progress: float = 0.0
+        self.state = None
+        self.__error: Optional[BaseException] = None
+        self.glyphs = GlyphAtlas(round(28 * scale), (255, 255, 255), "ADGILNO.")
+        if background is True:
+            threading.Thread(target=self.load, daemon=True).start()
+        else:
+            self.load()
+
+    def load(self) -> None:
+        try:
+            with phase("CardsImageFactory"):
+                factory = CardsImageFactory(self.scale, self.on_progress)
+            with phase("StartGameState"):
+                self.state = StartGameState(self.connection, self.seed, self.scale, factory, self.strategy,
+                                            self.variant, self.players, self.decks, self.partnership)
+        except BaseException as e:
+            self.__error = e
+
+    def on_progress(self, progress: float) -> None:
+        self.progress = progress
+
+    def update(self, time: int, mouse_up_event: Event, mouse_pos: tuple) -> None:
+        if self.__error is not None:
+            raise self.__error
+
+    def render(self, surface: Surface) -> int:
+        surface.fill((0, 38, 0))
+        width, height = surface.get_size()
+        bar = Rect(0, 0, width // 2, height // 30)
+        bar.center = (width // 2, height // 2)
+        blits = self.glyphs.draw(surface, "LOADING...", (bar.left, bar.top - self.glyphs.atlas.get_height() * 2))
+        draw.rect(surface, (255, 255, 255), bar, 1)
+        surface.fill((255, 255, 255), Rect(bar.left, bar.top, round(bar.width * self.progress), bar.height))
+        return blits + 2
+
+    def get_state(self) -> GameState:
+        if self.state is not None:
+            return self.state
+        return self
 
 
 class StartGameState(GameState):
-    def __init__(self):
-        map: Map = TiledParser("resources/deck01.json").get_map()
-        self.cpu = Cpu(map.get_object_group('CPU'))
-        self.table = Table(map.get_object_group('TABLE'))
-        self.actor = Player(map.get_object_group('PLAYER'))
+    def __init__(self, connection: Optional['RemoteConnection'] = None, seed: Optional[int] = None,
+                 scale: float = 1, factory: Optional[CardsImageFactory] = None, strategy: str = "simple",
+                 variant: str = "xeri", players: int = 2, decks: int = 1, partnership: bool = False):
+        with phase("TiledParser"):
+            map: Map = TiledParser(MAP_FILE, scale).get_map()
+        rules = VARIANTS[variant]
+        self.actor = Player(map.get_object_group('PLAYER'), rules)
+        if connection is None:
+            self.cpu = Cpu(map.get_object_group('CPU'), STRATEGIES[strategy](), rules)
+            self.table = Table(map.get_object_group('TABLE'), seed, factory, rules, decks)
+            named = {'PLAYER': self.actor, 'CPU': self.cpu}
+            for seat, name in enumerate(SEATS[players]):
+                player = named.get(name) or Cpu(map.get_object_group(name), STRATEGIES[strategy](), rules)
+                player.seat = seat
+                self.table.seats.append(player)
+            if partnership:
+                """ Partners sit across and score together, the team of a seat is seat % 2 """
+                for player in self.table.seats[2:]:
+                    player.score = self.table.seats[player.seat % 2].score
+        else:
+            from lockstep import LockstepConnection, LockstepActor, LockstepCpu
+            if isinstance(connection, LockstepConnection):
+                self.actor = LockstepActor(map.get_object_group('PLAYER'), connection)
+                self.cpu = LockstepCpu(map.get_object_group('CPU'), connection)
+            else:
+                from client import RemoteCpu
+                self.cpu = RemoteCpu(map.get_object_group('CPU'), connection)
+            self.table = Table(map.get_object_group('TABLE'), connection.join(), factory)
+            self.table.seats.extend(sorted((self.actor, self.cpu), key=lambda p: p.seat))
         self.state = None
-        self.actor.turn()
+        """ Whether the mouse was over the deck, the cursor is set when it changes """
+        self.__hover: Optional[bool] = None
+        self.table.lead()
 
     def update(self, time: int, mouse_up_event: Event, mouse_pos: tuple) -> None:
         self.update_mouse_cursor(self.table.table_deck.get_rect(), mouse_pos)
         if mouse_up_event is not None and \
-                self.table.table_deck.get_rect().colliderect(Rect(mouse_up_event.pos, (5, 5))):
+                self.table.table_deck.get_rect().colliderect(pointer(mouse_up_event.pos)):
             self.state = DealCardsState(self.actor, self.cpu, self.table, True)
 
-    def render(self, surface: Surface) -> None:
-        surface.fill((0, 38, 0))
-        self.actor.draw(surface)
-        self.cpu.draw(surface)
-        self.table.draw(surface)
+    def on_input(self, action: State) -> None:
+        if action is State.A or action is State.START:
+            self.state = DealCardsState(self.actor, self.cpu, self.table, True)
+
+    def render(self, surface: Surface) -> int:
+        return self.draw_cards(surface)
 
     def get_state(self) -> GameState:
         if self.state is not None:
@@ -151,11 +549,10 @@ class StartGameState(GameState):
         return self
 
     def update_mouse_cursor(self, src: Rect, mouse_pos: tuple) -> None:
-        if src.colliderect(Rect(mouse_pos, (5, 5))) and \
-                mouse.get_cursor() is not Cursor(SYSTEM_CURSOR_HAND):
-            mouse.set_cursor(Cursor(SYSTEM_CURSOR_HAND))
-        else:
-            mouse.set_cursor(Cursor(SYSTEM_CURSOR_ARROW))
+        hover = src.colliderect(pointer(mouse_pos))
+        if hover != self.__hover:
+            self.__hover = hover
+            set_cursor(HAND_CURSOR if hover else ARROW_CURSOR)
 
 
 class DealCardsState(GameState):
@@ -166,7 +563,7 @@ class DealCardsState(GameState):
         self.table.deck.start_deal()
         self.state = None
         self.initial = initial
-        mouse.set_cursor(Cursor(SYSTEM_CURSOR_ARROW))
+        set_cursor(ARROW_CURSOR)
 
     def update(self, time: int, mouse_up_event: Event, mouse_pos: tuple) -> None:
         if self.table.deck.is_finished() and self.initial is True:
@@ -175,13 +572,10 @@ class DealCardsState(GameState):
         if self.table.deck.is_finished():
             self.state = PlayGameState(self.actor, self.cpu, self.table)
             return
-        self.table.deck.deal(time, self.actor, self.cpu)
+        self.table.deck.deal(time, self.seats())
 
-    def render(self, surface: Surface) -> None:
-        surface.fill((0, 38, 0))
-        self.actor.draw(surface)
-        self.cpu.draw(surface)
-        self.table.draw(surface)
+    def render(self, surface: Surface) -> int:
+        return self.draw_cards(surface)
 
     def get_state(self) -> GameState:
         if self.state is not None:
@@ -203,11 +597,8 @@ class DealTableState(GameState):
             return
         self.table.deck.initial_deal(time, self.table)
 
-    def render(self, surface: Surface) -> None:
-        surface.fill((0, 38, 0))
-        self.actor.draw(surface)
-        self.cpu.draw(surface)
-        self.table.draw(surface)
+    def render(self, surface: Surface) -> int:
+        return self.draw_cards(surface)
 
     def get_state(self) -> GameState:
         if self.state is not None:
@@ -216,12 +607,23 @@ class DealTableState(GameState):
 
 
 class CollectWinningsState(GameState):
+    """ The pile goes to the winner a card every `INTERVAL` ms of the game clock, whatever the frame rate """
+    INTERVAL = 1000 // 60
+
     def __init__(self, actor: Player, cpu: Player, table: Table, last: bool = False):
         self.actor: Player = actor
         self.cpu: Player = cpu
         self.table: Table = table
         self.last: bool = last
         self.state = None
+        self.__timer: Optional[Timer] = None
+
+    def enter(self, scheduler: Scheduler) -> None:
+        super().enter(scheduler)
+        self.__timer = scheduler.every(self.INTERVAL, self.table.collect_winnings)
+
+    def leave(self) -> None:
+        self.__timer.cancel()
 
     def update(self, time: int, mouse_up_event: Event, mouse_pos: tuple) -> None:
         if self.table.has_winner() is False:
@@ -229,14 +631,9 @@ class CollectWinningsState(GameState):
                 self.state = EndGameState(self.actor, self.cpu, self.table)
                 return
             self.state = PlayGameState(self.actor, self.cpu, self.table)
-            return
-        self.table.collect_winnings()
 
-    def render(self, surface: Surface) -> None:
-        surface.fill((0, 38, 0))
-        self.actor.draw(surface)
-        self.cpu.draw(surface)
-        self.table.draw(surface)
+    def render(self, surface: Surface) -> int:
+        return self.draw_cards(surface)
 
     def get_state(self) -> GameState:
         if self.state is not None:
@@ -245,6 +642,9 @@ class CollectWinningsState(GameState):
 
 
 class EndGameState(GameState):
+    """ A click or A/START deals a rematch against a local Cpu """
+    IDLE = True
+
     def __init__(self, actor: Player, cpu: Player, table: Table):
         self.actor: Player = actor
         self.cpu: Player = cpu
@@ -252,13 +652,30 @@ class EndGameState(GameState):
         self.state = None
 
     def update(self, time: int, mouse_up_event: Event, mouse_pos: tuple) -> None:
-        pass
-
-    def render(self, surface: Surface) -> None:
-        surface.fill((0, 38, 0))
-        self.actor.draw(surface)
-        self.cpu.draw(surface)
-        self.table.draw(surface)
+        if mouse_up_event is not None:
+            self.rematch()
+
+    def on_input(self, action: State) -> None:
+        if action is State.A or action is State.START:
+            self.rematch()
+
+    def rematch(self) -> None:
+        """
+        Everything is reset in place, no file is read and no surface is
+        created. The next seed follows from the last one, so a recorded
+        session replays its rematches too.
+        """
+        if self.cpu.REMATCH is False or self.state is not None:
+            return
+        seed = None if self.table.seed is None else random.Random(self.table.seed).getrandbits(32)
+        self.table.reset(seed)
+        for player in self.seats():
+            player.reset()
+        self.table.lead()
+        self.state = DealCardsState(self.actor, self.cpu, self.table, True)
+
+    def render(self, surface: Surface) -> int:
+        return self.draw_cards(surface)
 
     def get_state(self) -> GameState:
         if self.state is not None:
@@ -1,22 +1,24 @@
-from pygame import Surface, Rect, image
+from collections import OrderedDict
+from pygame import Surface, Rect, image, font
 from pygame.sprite import Sprite
-from pygame.transform import scale2x
+from pygame.transform import scale, scale2x
 from pygame.display import set_mode, update
-from pygame.locals import HWSURFACE, SRCALPHA, FULLSCREEN
+from pygame.locals import HWSURFACE, SRCALPHA, FULLSCREEN, RLEACCEL
 
 
 class Graphics(object):
     def __init__(self, width: int, height: int):
         self.screen = set_mode((width, height))
-        """ temp Surface for handling the small graphics """
-        self.__surface = Surface((width, height))
+        """ temp Surface for handling the small graphics, in the display format so presenting it is a copy """
+        self.__surface = Surface((width, height)).convert()
+        """ Blitted without returning a Rect, `blit` makes one every frame """
+        self.__present: list = [(self.__surface, (0, 0))]
 
     def get_surface(self) -> Surface:
         return self.__surface
 
     def render(self) -> None:
-        self.__surface.convert_alpha()
-        self.screen.blit(self.__surface, (0, 0))
+        self.screen.blits(self.__present, False)
         update()
 
 
@@ -27,12 +29,105 @@ class SpriteSheet(object):
         self.colorkey = colorkey
 
     def get_image(self, x: int, y: int, width: int, height: int) -> Surface:
-        image = Surface([width, height], SRCALPHA).convert()
-        image.set_colorkey(self.colorkey)
+        """ In the display format with a RLE colorkey, the cheapest surface to blit """
+        image = Surface([width, height]).convert()
         image.blit(self.sprite_sheet, (0, 0), (x, y, width, height))
+        image.set_colorkey(self.colorkey, RLEACCEL)
         return image
 
 
+def scale_image(surface: Surface, factor: float) -> Surface:
+    if factor == 2:
+        scaled = scale2x(surface)
+    else:
+        width, height = surface.get_size()
+        scaled = scale(surface, (round(width * factor), round(height * factor)))
+    """ The scaled copy keeps the colorkey but not the RLE acceleration """
+    if surface.get_colorkey() is not None:
+        scaled.set_colorkey(surface.get_colorkey(), RLEACCEL)
+    return scaled
+
+
+class RenderQueue(object):
+    """
+    Gathers (image, position) pairs over a frame and draws them with one
+    `Surface.fblits`, or `Surface.blits` where pygame has no `fblits`, in
+    the order they were added. The list is overwritten in place frame
+    after frame, so it is not allocated again.
+    """
+    def __init__(self):
+        self.__items: list = []
+        self.__count: int = 0
+
+    def add(self, image: Surface, dest) -> None:
+        self.__put((image, dest))
+
+    def __put(self, item: tuple) -> None:
+        if self.__count < len(self.__items):
+            self.__items[self.__count] = item
+        else:
+            self.__items.append(item)
+        self.__count += 1
+
+    def add_sprites(self, sprites) -> None:
+        """ Sprites with a `blit_item`, the (image, rect) pair `cards.Card` keeps """
+        items = self.__items
+        count = self.__count
+        for s in sprites:
+            if count < len(items):
+                items[count] = s.blit_item
+            else:
+                items.append(s.blit_item)
+            count += 1
+        self.__count = count
+
+    def flush(self, surface: Surface) -> int:
+        """ Returns the number of blits """
+        count = self.__count
+        if count > 0:
+            items = self.__items
+            if len(items) > count:
+                del items[count:]
+            fblits = getattr(surface, "fblits", None)
+            if fblits is not None:
+                fblits(items)
+            else:
+                surface.blits(items, False)
+            self.__count = 0
+        return count
+
+    def __len__(self) -> int:
+        return self.__count
+
+
+class ScaledImageCache(object):
+    """
+    Images scaled once per scale factor. Kept in a bounded LRU cache keyed
+    by (index, scale), so switching resolutions does not grow memory.
+    """
+    def __init__(self, images: list, capacity: int):
+        self.images = images
+        self.capacity = capacity
+        self.__cache: OrderedDict = OrderedDict()
+
+    def get(self, index: int, factor: float) -> Surface:
+        if factor == 1:
+            return self.images[index]
+        key = (index, factor)
+        surface = self.__cache.get(key)
+        if surface is not None:
+            self.__cache.move_to_end(key)
+            return surface
+        surface = scale_image(self.images[index], factor)
+        self.__cache[key] = surface
+        if len(self.__cache) > self.capacity:
+            self.__cache.popitem(last=False)
+        return surface
+
+    def __len__(self) -> int:
+        return len(self.__cache)
+
+
 class ImageFactory(object):
     """
     Loads images from a Spritesheet and index them.
@@ -43,3 +138,42 @@ class ImageFactory(object):
 
     def get_image(self, index: int) -> Surface:
         raise NotImplementedError("Implement `get_image` method.")
+
+
+class GlyphAtlas(object):
+    """
+    Renders every character once into a single surface. Text is drawn by
+    blitting areas of the atlas, so there is no `font.render` per frame.
+    """
+    CHARS = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ :-/"
+
+    def __init__(self, size: int, color: tuple, chars: str = CHARS):
+        face = font.Font(None, size)
+        glyphs = [face.render(c, True, color) for c in chars]
+        width = sum(g.get_width() for g in glyphs)
+        height = max(g.get_height() for g in glyphs)
+        self.atlas = Surface((width, height), SRCALPHA)
+        self.rects: dict = {}
+        x = 0
+        for c, glyph in zip(chars, glyphs):
+            self.atlas.blit(glyph, (x, 0))
+            self.rects[c] = Rect(x, 0, glyph.get_width(), height)
+            x += glyph.get_width()
+
+    def layout(self, text: str, pos: tuple) -> list:
+        """ The (atlas, position, area) blits of `text`, kept by callers that draw it every frame """
+        x, y = pos
+        items = []
+        for c in text:
+            rect = self.rects.get(c)
+            if rect is None:
+                continue
+            items.append((self.atlas, (x, y), rect))
+            x += rect.width
+        return items
+
+    def draw(self, surface: Surface, text: str, pos: tuple) -> int:
+        """ Returns the number of blits """
+        items = self.layout(text, pos)
+        surface.blits(items, False)
+        return len(items)
@@ -0,0 +1,116 @@
+"""
+Reloads the table layout and the card sheet while the game runs.
+Files are polled with `os.stat` from a `Game.scheduler` timer, only the changed one is read again and
+the result is applied at the start of a frame, so a frame never shows
+half of a change.
+"""
+import os
+import threading
+from typing import Optional
+from xml.etree.ElementTree import ParseError
+from cards import CardsImageFactory
+from tiled_parser import TiledParser
+
+
+class FileWatcher(object):
+    def __init__(self, files: list):
+        self.__stats: dict = {f: self.__stat(f) for f in files}
+
+    def __stat(self, filename: str) -> Optional[tuple]:
+        try:
+            stat = os.stat(filename)
+        except FileNotFoundError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def changed(self) -> list:
+        """ Files written since the last call """
+        changed = []
+        for filename, old in self.__stats.items():
+            new = self.__stat(filename)
+            if new != old:
+                self.__stats[filename] = new
+                if new is not None:
+                    changed.append(filename)
+        return changed
+
+
+class HotReloader(object):
+    """
+    A new layout moves every card by as much as its slot moved. A new
+    sheet is cut in a thread and its images replace the old ones between
+    two frames.
+    """
+    INTERVAL = 250
+
+    def __init__(self, map_file: str, scale: float = 1):
+        self.map_file = map_file
+        self.sheet_file = CardsImageFactory.FILENAME
+        self.scale = scale
+        self.watcher = FileWatcher([map_file, self.sheet_file])
+        self.__factory: Optional[CardsImageFactory] = None
+        self.__loading = False
+        """ The sheet changed again while the thread was cutting it """
+        self.__pending = False
+
+    def update(self, state) -> None:
+        """ Every frame, swaps in a sheet the thread finished """
+        if self.__factory is not None:
+            table = getattr(state, "table", None)
+            if table is not None:
+                table.deck.set_factory(self.__factory)
+            self.__factory = None
+
+    def poll(self, state) -> None:
+        """ Every `INTERVAL` ms """
+        table = getattr(state, "table", None)
+        for filename in self.watcher.changed():
+            if table is None:
+                """ Still loading, the new files are read anyway """
+                continue
+            if filename == self.map_file:
+                self.reload_map(state)
+            else:
+                self.__pending = True
+        if self.__pending and not self.__loading:
+            self.__pending = False
+            self.__loading = True
+            threading.Thread(target=self.load_sheet, daemon=True).start()
+
+    def reload_map(self, state) -> None:
+        try:
+            map = TiledParser(self.map_file, self.scale).get_map()
+        except (ParseError, ValueError, KeyError) as e:
+            """ Editors may save in steps, the next write is tried again """
+            print("{}: {}".format(self.map_file, e))
+            return
+        error = self.check_map(map, state)
+        if error is not None:
+            """ The cards stay where they are until a map fits the table """
+            print("{}: {}".format(self.map_file, error))
+            return
+        for player in state.seats():
+            player.relayout(map.get_object_group(player.objectgroup.get_name()))
+        state.table.relayout(map.get_object_group('TABLE'))
+
+    def check_map(self, map, state) -> Optional[str]:
+        """ Why `map` can not take the cards of `state`, None when it can """
+        for player in state.seats():
+            name = player.objectgroup.get_name()
+            group = map.get_object_group(name)
+            if group is None:
+                return "no object group {}".format(name)
+            if len(group.get_items()) < len(player.objectgroup.get_items()) or group.get_item("deck") is None:
+                return "object group {} has fewer slots".format(name)
+        table = map.get_object_group('TABLE')
+        if table is None or table.get_item("table") is None or table.get_item("table_deck") is None:
+            return "no TABLE object group with a table and a table_deck"
+        return None
+
+    def load_sheet(self) -> None:
+        try:
+            self.__factory = CardsImageFactory(self.scale)
+        except Exception as e:
+            print("{}: {}".format(self.sheet_file, e))
+        finally:
+            self.__loading = False
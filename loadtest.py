@@ -0,0 +1,74 @@
+"""
+Simulated clients for `server.py`. Every client joins its own table and
+plays the first card on hand until the game is over. Reports moves/sec
+and the round trip latency of a move (play sent -> next turn received).
+"""
+import asyncio
+import argparse
+import json
+import time
+from server import Server, encode
+from profiler import percentile
+
+
+async def client(host: str, port: int, seed: int, latencies: list) -> int:
+    reader, writer = await asyncio.open_connection(host, port)
+    writer.write(encode({"op": "join", "seed": seed}))
+    moves = 0
+    sent = 0.0
+    async for line in reader:
+        message = json.loads(line)
+        op = message["op"]
+        if op == "turn":
+            if sent > 0:
+                latencies.append(time.perf_counter() - sent)
+            sent = time.perf_counter()
+            writer.write(encode({"op": "play", "card": message["hand"][0]}))
+            await writer.drain()
+            moves += 1
+        elif op == "over":
+            latencies.append(time.perf_counter() - sent)
+            break
+        elif op == "error":
+            raise RuntimeError(message["reason"])
+    writer.write(encode({"op": "leave"}))
+    writer.close()
+    return moves * 2
+
+
+async def run(clients: int, host: str, port: int) -> dict:
+    server = None
+    if port == 0:
+        server = Server(host, 0, clients)
+        await server.start()
+        port = server.port
+    latencies: list = []
+    start = time.perf_counter()
+    moves = await asyncio.gather(*[client(host, port, i, latencies) for i in range(clients)])
+    elapsed = time.perf_counter() - start
+    if server is not None:
+        await server.close()
+    return {
+        "clients": clients,
+        "moves": sum(moves),
+        "seconds": elapsed,
+        "moves_per_sec": sum(moves) / elapsed,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p90_ms": percentile(latencies, 90) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Load test for the Xeri table server")
+    parser.add_argument("--clients", type=int, default=1000)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=0, help="0 starts a server in process")
+    args = parser.parse_args()
+    result = asyncio.run(run(args.clients, args.host, args.port))
+    for key, value in result.items():
+        print("{:>14}: {}".format(key, round(value, 3) if isinstance(value, float) else value))
+
+
+if __name__ == "__main__":
+    main()
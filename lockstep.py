@@ -0,0 +1,168 @@
+"""
+Head to head play between two `main.py` over TCP, without a server.
+
+The host picks the seed and sends it once, then only moves travel: the
+hand index of the played card and a hash of the game before the move,
+5 bytes. Both sides keep a `rules.Xeri` of the game and play every move
+on it, a hash that differs from the local one is a desync.
+
+    python main.py --host 7778
+    python main.py --join 127.0.0.1:7778
+"""
+import random
+import socket
+import struct
+import zlib
+from typing import Optional
+from cards import Card, Cpu, Player, Table
+from rules import Xeri
+from tiled_parser import ObjectGroup
+
+MAGIC = b"XLCK"
+VERSION = 1
+""" Sent by the host: magic, version and the seed of the deal """
+HELLO = struct.Struct("<4sBQ")
+""" Hand index of the played card and `state_hash` before it """
+MOVE = struct.Struct("<BI")
+
+
+def state_hash(game: Xeri) -> int:
+    """ CRC32 of the hands, the pile, the cards left and the points """
+    state = bytearray([game.turn])
+    for hand in game.hands:
+        state.extend(hand)
+        state.append(0xFF)
+    state.extend(game.pile)
+    state.append(0xFF)
+    state.append(len(game.deck))
+    for score in game.scores:
+        state.extend(score.points.to_bytes(2, "little"))
+    return zlib.crc32(state)
+
+
+def receive(sock: socket.socket, size: int) -> bytes:
+    data = b""
+    while len(data) < size:
+        chunk = sock.recv(size - len(data))
+        if chunk == b"":
+            raise ConnectionError("Peer closed the connection")
+        data += chunk
+    return data
+
+
+class LockstepConnection(object):
+    """
+    One peer of a game, seat 0 for the host and seat 1 for the one who
+    joined. Reads are non blocking so the frame loop never waits on the
+    network.
+    """
+    def __init__(self, sock: socket.socket, seed: int, seat: int):
+        self.__socket = sock
+        self.__socket.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.__socket.setblocking(False)
+        self.__buffer = b""
+        self.seed: int = seed
+        self.seat: int = seat
+        self.game: Xeri = Xeri(seed)
+
+    @classmethod
+    def host(cls, port: int, seed: Optional[int] = None) -> 'LockstepConnection':
+        """ Waits on `port` for the other player, blocking """
+        with socket.create_server(("", port)) as server:
+            return cls.accept(server, random.getrandbits(32) if seed is None else seed)
+
+    @classmethod
+    def accept(cls, server: socket.socket, seed: int) -> 'LockstepConnection':
+        """ Waits on a listening socket for the other player """
+        sock, address = server.accept()
+        sock.sendall(HELLO.pack(MAGIC, VERSION, seed))
+        return cls(sock, seed, 0)
+
+    @classmethod
+    def connect(cls, host: str, port: int) -> 'LockstepConnection':
+        sock = socket.create_connection((host, port))
+        magic, version, seed = HELLO.unpack(receive(sock, HELLO.size))
+        if magic != MAGIC or version != VERSION:
+            sock.close()
+            raise ConnectionError("Not a lockstep host: {}:{}".format(host, port))
+        return cls(sock, seed, 1)
+
+    def join(self) -> int:
+        return self.seed
+
+    def send(self, card: int) -> None:
+        """ The local player played `card` """
+        game = self.game
+        if game.turn != self.seat or card not in game.hands[self.seat]:
+            raise ConnectionError("Desync on move {}: card {} can not be played".format(game.moves, card))
+        index = game.hands[self.seat].index(card)
+        self.__socket.sendall(MOVE.pack(index, state_hash(game)))
+        game.play(index)
+
+    def poll(self) -> list:
+        """ Cards the other player played since the last call """
+        try:
+            data = self.__socket.recv(4096)
+        except BlockingIOError:
+            return []
+        if data == b"":
+            raise ConnectionError("Peer closed the connection")
+        self.__buffer += data
+        cards = []
+        while len(self.__buffer) >= MOVE.size:
+            index, expected = MOVE.unpack_from(self.__buffer)
+            self.__buffer = self.__buffer[MOVE.size:]
+            cards.append(self.__apply(index, expected))
+        return cards
+
+    def __apply(self, index: int, expected: int) -> int:
+        game = self.game
+        if state_hash(game) != expected:
+            raise ConnectionError("Desync on move {}: the state hashes differ".format(game.moves))
+        if game.turn == self.seat or index >= len(game.hands[game.turn]):
+            raise ConnectionError("Desync on move {}: hand index {} can not be played".format(game.moves, index))
+        return game.play(index)[0]
+
+    def close(self) -> None:
+        self.__socket.close()
+
+
+class LockstepActor(Player):
+    """ The local player, a card is sent as soon as it leaves the hand """
+    def __init__(self, objectgroup: ObjectGroup, connection: LockstepConnection):
+        super().__init__(objectgroup)
+        self.connection = connection
+        self.seat = connection.seat
+
+    def play(self, time: int, table: Table) -> None:
+        card = self.card_to_play
+        if card is not None and self.is_turn() and self.on_hand.has(card):
+            self.connection.send(card.index)
+        super().play(time, table)
+
+
+class LockstepCpu(Cpu):
+    """ The other player, its cards come from the connection """
+    REMATCH = False
+    """ The move already waits on the network """
+    DELAY = 0
+
+    def __init__(self, objectgroup: ObjectGroup, connection: LockstepConnection):
+        super().__init__(objectgroup)
+        self.connection = connection
+        self.seat = 1 - connection.seat
+        self.__received: list = []
+
+    def play(self, time: int, table: Table) -> None:
+        self.__received.extend(self.connection.poll())
+        if self.card_to_play is None:
+            if len(self.__received) == 0:
+                return
+            self.card_to_play = self.find(self.__received.pop(0))
+        Player.play(self, time, table)
+
+    def find(self, index: int) -> Optional[Card]:
+        for c in self.on_hand:
+            if c.index == index:
+                return c
+        raise ConnectionError("Desync: card {} is not on hand".format(index))
@@ -1,21 +1,117 @@
+import sys
+if "--profile-startup" in sys.argv:
+    """ Installed before the other imports, so they are timed too """
+    import startup
+    startup.install()
+import argparse
+import random
 import pygame
-from pygame.locals import K_ESCAPE, QUIT, KEYUP, KEYDOWN, K_d, MOUSEMOTION, MOUSEBUTTONUP
+from pygame.locals import K_ESCAPE, QUIT, KEYUP, KEYDOWN, K_d, MOUSEMOTION, MOUSEBUTTONUP, \
+    JOYBUTTONDOWN, JOYBUTTONUP, JOYHATMOTION, JOYAXISMOTION, JOYDEVICEADDED, JOYDEVICEREMOVED, NOEVENT
 from pygame.event import Event
 from game import Game
+from controls import Controller
+from policy import STRATEGIES, XERI_ONLY
+from rules import VARIANTS
+from profiler import EVENTS
+from startup import phase, STARTUP_BUDGET
+from typing import Optional
 
 
 class App(object):
     FPS = 60
+    """ Longest sleep of an idle frame when no timer is scheduled """
+    IDLE_WAIT = 1000
+    JOY_EVENTS: tuple = (JOYBUTTONDOWN, JOYBUTTONUP, JOYHATMOTION, JOYAXISMOTION, JOYDEVICEADDED, JOYDEVICEREMOVED)
 
-    def __init__(self):
+    def __init__(self, connect: Optional[str] = None, trace: Optional[str] = None,
+                 record: Optional[str] = None, seed: Optional[int] = None, scale: float = 1):
         self.running = True
+        self.scale = scale
+        self.background = True
+        self.connect = connect
+        self.trace = trace
+        self.record = record
+        self.seed = seed
+        self.connection = None
+        self.recorder = None
+        self.profile_startup = False
+        self.strategy = "simple"
+        self.variant = "xeri"
+        """ Seats at the table, decks shuffled together and whether the seats across are a team """
+        self.players = 2
+        self.decks = 1
+        self.partnership = False
+        self.dataset: Optional[str] = None
+        """ The finished game on the table is in the dataset, a rematch starts another one """
+        self.saved = False
+        self.watch = False
+        """ Lockstep play against another `main.py`: the port to host on or HOST:PORT to join """
+        self.host: Optional[int] = None
+        self.join: Optional[str] = None
+        """ PNG directory or .gif file to record the frames to, a blocking capture never drops frames """
+        self.capture: Optional[str] = None
+        self.capture_fps: Optional[float] = None
+        self.capture_block = False
+        """ .csv or .jsonl file for the game events, and whether to print them """
+        self.events: Optional[str] = None
+        self.log_events = False
+        self.exit_code = 0
 
     def on_init(self) -> None:
-        pygame.init()
-        self.game = Game()
+        with phase("pygame.init"):
+            """ Only what the game uses, the joystick waits for the first frame """
+            pygame.display.init()
+            pygame.font.init()
+        if self.connect is not None:
+            from client import RemoteConnection
+            host, port = self.connect.rsplit(":", 1)
+            self.connection = RemoteConnection(host, int(port))
+        elif self.host is not None:
+            from lockstep import LockstepConnection
+            print("waiting for a player on port {}".format(self.host))
+            self.connection = LockstepConnection.host(self.host, self.seed)
+        elif self.join is not None:
+            from lockstep import LockstepConnection
+            host, port = self.join.rsplit(":", 1)
+            self.connection = LockstepConnection.connect(host, int(port))
+        if (self.record is not None or self.dataset is not None) and self.seed is None:
+            """ A replay and the dataset need the same deal """
+            self.seed = random.getrandbits(32)
+        if self.record is not None:
+            from replay import EventRecorder
+            self.recorder = EventRecorder(self.seed, self.strategy, self.variant, self.players, self.decks,
+                                          self.partnership)
+        self.game = Game(self.connection, self.seed, self.scale, self.background, self.strategy, self.variant,
+                         self.players, self.decks, self.partnership)
+        if self.watch:
+            self.game.watch()
+        if self.capture is not None:
+            self.game.start_capture(self.capture, self.capture_fps, self.capture_block)
+        if self.events is not None or self.log_events:
+            import events
+            if self.events is not None:
+                events.attach(events.EventExport(self.events))
+            if self.log_events:
+                events.attach(events.EventLog())
+        self.controller = Controller()
+        if self.trace is not None:
+            self.game.profiler.trace = []
 
     def on_loop(self, time: int) -> None:
-        self.game.update(time)
+        try:
+            self.game.update(time)
+        except ConnectionError as e:
+            """ A desync or a peer that left ends the game, the session is still saved on cleanup """
+            print("Game over: {}".format(e))
+            self.exit_code = 1
+            self.running = False
+            return
+        if self.dataset is not None:
+            over = self.game.is_over()
+            if over and not self.saved:
+                self.on_game_over()
+            self.saved = over
 
     def on_render(self) -> None:
         self.game.render()
@@ -23,9 +119,51 @@ class App(object):
     def on_exit(self) -> None:
         self.running = False
 
+    def on_idle(self) -> None:
+        """ Sleeps until an input arrives or the next scheduler timer is due """
+        wakeup = self.game.next_wakeup()
+        event = pygame.event.wait(self.IDLE_WAIT if wakeup is None else max(1, wakeup))
+        if event.type != NOEVENT:
+            pygame.event.post(event)
+
+    def on_first_frame(self) -> None:
+        """ Opening the joysticks can be slow, JOYDEVICEADDED arrives after it """
+        with phase("joystick.init"):
+            pygame.joystick.init()
+
+    def on_startup_profiled(self) -> None:
+        import startup
+        first_frame = dict(startup.PROFILER.marks)["first frame"]
+        startup.PROFILER.mark("assets ready")
+        startup.PROFILER.uninstall()
+        print(startup.PROFILER.report())
+        if first_frame > STARTUP_BUDGET:
+            print("first frame after {:.1f} ms, over the {} ms budget".format(first_frame, STARTUP_BUDGET))
+            self.exit_code = 1
+        self.running = False
+
     def on_cleanup(self):
+        capture = self.game.stop_capture()
+        if capture is not None:
+            print("{} frames captured to {}, {} dropped".format(capture.captured, self.capture, capture.dropped))
+        if self.events is not None or self.log_events:
+            import events
+            events.close()
+        if self.recorder is not None:
+            self.recorder.save(self.record)
+        if self.trace is not None:
+            self.game.profiler.export(self.trace)
+        if self.connection is not None:
+            self.connection.close()
         pygame.quit()
 
+    def on_game_over(self) -> None:
+        from dataset import DatasetWriter, replay
+        seed = self.game.get_table().seed
+        writer = DatasetWriter(self.dataset)
+        writer.add(seed, *replay(seed, self.game.get_table().played))
+        writer.close()
+
     def on_key_down(self, event: Event):
         pass
 
@@ -41,13 +179,22 @@ class App(object):
         if event.key == K_d:
             self.game.toggle_debug()
 
+    def on_controller(self, event: Event) -> None:
+        action = self.controller.on_event(event)
+        if action is not None:
+            self.game.on_input(action)
+
     def on_event(self, event: Event) -> None:
         if event.type == QUIT:
             self.on_exit()
         elif event.type == KEYUP:
             self.on_key_up(event)
+            self.on_controller(event)
         elif event.type == KEYDOWN:
             self.on_key_down(event)
+            self.on_controller(event)
+        elif event.type in self.JOY_EVENTS:
+            self.on_controller(event)
         elif event.type == MOUSEMOTION:
             self.on_mouse_move(event)
         elif event.type == MOUSEBUTTONUP:
@@ -58,16 +205,90 @@ class App(object):
             return
 
         clock = pygame.time.Clock()
+        frames = 0
 
-        while(self.running):
-            clock.tick(self.FPS)
-            for event in pygame.event.get():
-                self.on_event(event)
-            self.on_loop(clock.get_time())
-            self.on_render()
-        self.on_cleanup()
+        try:
+            while self.running:
+                clock.tick(self.FPS)
+                self.game.profiler.begin()
+                events = pygame.event.get()
+                """ Input while loading is dropped and a replay loads at once, so it is not recorded """
+                if self.recorder is not None:
+                    if self.game.is_loading():
+                        self.recorder.hold(events)
+                    else:
+                        self.recorder.record(clock.get_time(), events)
+                for event in events:
+                    self.on_event(event)
+                self.game.profiler.mark(EVENTS)
+                self.on_loop(clock.get_time())
+                self.on_render()
+                frames += 1
+                if frames == 1:
+                    if self.profile_startup:
+                        import startup
+                        startup.PROFILER.mark("first frame")
+                    self.on_first_frame()
+                if self.profile_startup and not self.game.is_loading():
+                    self.on_startup_profiled()
+                if self.running and self.game.is_idle():
+                    self.on_idle()
+        finally:
+            self.on_cleanup()
 
 
 if __name__ == "__main__":
-    app = App()
+    parser = argparse.ArgumentParser(description="Xeri card game")
+    parser.add_argument("--connect", metavar="HOST:PORT", help="play against a table on `server.py`")
+    parser.add_argument("--host", type=int, metavar="PORT", help="wait for another player to `--join` this game")
+    parser.add_argument("--join", metavar="HOST:PORT", help="play against a player who runs `--host`")
+    parser.add_argument("--trace", metavar="FILE", help="write frame timings to a .csv or .json file on exit")
+    parser.add_argument("--record", metavar="FILE", help="record the input events for `replay.py`")
+    parser.add_argument("--seed", type=int, help="shuffle the deck with this seed")
+    parser.add_argument("--cpu", default="simple", choices=sorted(STRATEGIES), help="strategy of the Cpu player")
+    parser.add_argument("--variant", default="xeri", choices=sorted(VARIANTS), help="rules of the game")
+    parser.add_argument("--players", type=int, default=2, choices=(2, 3, 4), help="seats at the table")
+    parser.add_argument("--decks", type=int, default=1, choices=(1, 2), help="decks shuffled together")
+    parser.add_argument("--partnership", action="store_true", help="4 players, the seats across are a team")
+    parser.add_argument("--dataset", metavar="DIR", help="append the finished games to a `dataset.py` store")
+    parser.add_argument("--watch", action="store_true", help="reload the map and the card sheet when they change")
+    parser.add_argument("--capture", metavar="PATH", help="record the frames to a PNG directory or a .gif file")
+    parser.add_argument("--capture-fps", type=float, help="frames per second to capture, 25 for a .gif")
+    parser.add_argument("--events", metavar="FILE", help="write the game events to a .csv or .jsonl file")
+    parser.add_argument("--log-events", action="store_true", help="print the game events")
+    parser.add_argument("--resolution", metavar="WIDTHxHEIGHT", help="e.g. 1920x1080, the table is scaled to fit")
+    parser.add_argument("--profile-startup", action="store_true",
+                        help="report the time of imports and startup steps, then exit")
+    args = parser.parse_args()
+    remote = any(a is not None for a in (args.connect, args.host, args.join, args.dataset))
+    if args.variant != "xeri" and remote:
+        """ The server, the lockstep peers and the dataset play Xeri """
+        parser.error("--variant {} is played locally and without --dataset".format(args.variant))
+    if (args.players, args.decks) != (2, 1) and remote:
+        """ So is a single deck between two players """
+        parser.error("--players and --decks are played locally and without --dataset")
+    if args.variant != "xeri" and args.cpu in XERI_ONLY:
+        parser.error("--cpu {} plays only --variant xeri".format(args.cpu))
+    if args.partnership and args.players != 4:
+        parser.error("--partnership needs --players 4")
+    scale = 1
+    if args.resolution is not None:
+        width, height = args.resolution.lower().split("x")
+        scale = min(int(width) / Game.SCREEN_WIDTH, int(height) / Game.SCREEN_HEIGHT)
+    app = App(args.connect, args.trace, args.record, args.seed, scale)
+    app.profile_startup = args.profile_startup
+    app.strategy = args.cpu
+    app.variant = args.variant
+    app.players = args.players
+    app.decks = args.decks
+    app.partnership = args.partnership
+    app.dataset = args.dataset
+    app.watch = args.watch
+    app.host = args.host
+    app.capture = args.capture
+    app.capture_fps = args.capture_fps
+    app.events = args.events
+    app.log_events = args.log_events
+    app.join = args.join
     app.on_execute()
+    sys.exit(app.exit_code)
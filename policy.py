@@ -0,0 +1,311 @@
+"""
+Precomputed plays for the small decision points: leading onto an empty
+table and answering a single card on the table. A hand of up to
+`max_hand` cards, each as its face and how many cards of that face were
+already shown, and the face on top of the table index one byte of a flat
+file, which is memory-mapped and read in O(1).
+
+    python policy.py --max-hand 2 --samples 100 --output resources/policy.bin
+"""
+import argparse
+import itertools
+import json
+import math
+import mmap
+import os
+import random
+import struct
+from typing import Optional
+from rules import CARD_POINTS, JACK_FACE, NUMBER_OF_CARDS, GreedyStrategy, Strategy, Xeri
+from rules import STRATEGIES as RULES_STRATEGIES
+
+POLICY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "policy.bin")
+LINEAR_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "resources", "linear.json")
+MAGIC = b"XPOL"
+HEADER = struct.Struct("<4sBB")
+VERSION = 1
+""" Entry of a decision point that was not computed """
+UNKNOWN = 0xFF
+""" Top slots 0-12 are the faces on the table, 13 an empty table """
+EMPTY = 13
+TOP_SLOTS = 14
+""" A card on hand is the symbol face * 4 + cards of the face shown, at most 3 """
+SEEN = 4
+SYMBOLS = 13 * SEEN
+""" Standard errors a play needs over the greedy one to be stored instead """
+SIGNIFICANCE = 2.0
+
+
+def hand_offsets(max_hand: int) -> list:
+    """ Where the multisets of each hand size start, hands of 1 to `max_hand` cards """
+    offsets = [0, 0]
+    for size in range(1, max_hand + 1):
+        offsets.append(offsets[-1] + math.comb(SYMBOLS - 1 + size, size))
+    return offsets
+
+
+def rank(symbols: list) -> int:
+    """ Colex rank of a sorted multiset of symbols among the multisets of its size """
+    r = 0
+    for i, symbol in enumerate(symbols):
+        r += math.comb(symbol + i, i + 1)
+    return r
+
+
+def symbol(face: int, seen: int) -> int:
+    return face * SEEN + min(seen, SEEN - 1)
+
+
+class PolicyTable(object):
+    def __init__(self, filename: str):
+        with open(filename, "rb") as f:
+            self.__map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.max_hand = HEADER.unpack_from(self.__map)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError("Not a policy file: " + filename)
+        self.__offsets = hand_offsets(self.max_hand)
+        self.__stride = self.__offsets[-1]
+        if len(self.__map) != HEADER.size + TOP_SLOTS * self.__stride:
+            raise ValueError("Truncated policy file: " + filename)
+
+    def index(self, symbols: list, top: Optional[int]) -> int:
+        slot = EMPTY if top is None else top % 13
+        return HEADER.size + slot * self.__stride + self.__offsets[len(symbols)] + rank(symbols)
+
+    def lookup(self, hand: list, top: Optional[int], pile_size: int, seen: list) -> Optional[int]:
+        """ Position in `hand` of the card to play, None when the table has no answer """
+        if pile_size > 1 or len(hand) == 0 or len(hand) > self.max_hand:
+            return None
+        face = self.__map[self.index(sorted(symbol(card % 13, seen[card % 13]) for card in hand), top)]
+        if face == UNKNOWN:
+            return None
+        best = None
+        for i, card in enumerate(hand):
+            if card % 13 == face and (best is None or CARD_POINTS[card] < CARD_POINTS[hand[best]]):
+                best = i
+        return best
+
+    def close(self) -> None:
+        self.__map.close()
+
+
+__tables: dict = {}
+
+
+def load(filename: str = POLICY_FILE) -> Optional[PolicyTable]:
+    """ One mapping per file and process, None when the file was never built """
+    if filename not in __tables:
+        __tables[filename] = PolicyTable(filename) if os.path.exists(filename) else None
+    return __tables[filename]
+
+
+class PolicyStrategy(Strategy):
+    """
+    Plays from the lookup table when the position is in it and asks
+    `fallback` otherwise.
+    """
+    def __init__(self, table: Optional[PolicyTable] = None, fallback: Optional[Strategy] = None):
+        self.table = table or load()
+        self.fallback = fallback or GreedyStrategy()
+
+    def choose(self, hand: list, game: Xeri) -> int:
+        if self.table is not None:
+            i = self.table.lookup(hand, game.top(), game.pile_size(), game.seen)
+            if i is not None:
+                return i
+        return self.fallback.choose(hand, game)
+
+
+""" Features of playing a card, `selfplay.features` computes the same for a batch of games """
+FEATURES: tuple = ("capture", "same_face", "xeri", "jack", "captured_cards", "top_points",
+                   "points", "dead_face", "pair_on_hand", "jack_thrown", "lead_points")
+
+
+def card_features(card: int, hand: list, top: Optional[int], pile_size: int, seen: list) -> list:
+    face = card % 13
+    same = top is not None and face == top % 13
+    capture = same or (top is not None and face == JACK_FACE)
+    pair = sum(1 for other in hand if other % 13 == face) - 1
+    return [
+        float(capture),
+        float(same),
+        float(same and pile_size == 1),
+        float(face == JACK_FACE),
+        pile_size / 10 if capture else 0.0,
+        float(CARD_POINTS[top]) if capture else 0.0,
+        float(CARD_POINTS[card]),
+        seen[face] / 4 if not capture else 0.0,
+        pair / 3 if not capture else 0.0,
+        float(face == JACK_FACE and not capture),
+        float(CARD_POINTS[card]) if top is None else 0.0,
+    ]
+
+
+class LinearStrategy(Strategy):
+    """
+    The card with the highest `weights` . `card_features`, trained by
+    `selfplay.py` and exported to `resources/linear.json`.
+    """
+    def __init__(self, weights: Optional[list] = None):
+        if weights is None:
+            with open(LINEAR_FILE) as f:
+                data = json.load(f)
+            if tuple(data["features"]) != FEATURES:
+                raise ValueError("The weights were trained on other features: " + LINEAR_FILE)
+            weights = data["weights"]
+        self.weights: list = weights
+
+    def choose(self, hand: list, game: Xeri) -> int:
+        top = game.top()
+        pile_size = game.pile_size()
+        best = 0
+        best_value = None
+        for i, card in enumerate(hand):
+            value = sum(w * f for w, f in zip(self.weights, card_features(card, hand, top, pile_size, game.seen)))
+            if best_value is None or value > best_value:
+                best = i
+                best_value = value
+        return best
+
+
+""" `rules.STRATEGIES`, the lookup table and the trained weights """
+STRATEGIES: dict = dict(RULES_STRATEGIES, policy=PolicyStrategy, linear=LinearStrategy)
+""" Built on the points and the Jack of `rules.Xeri`, not on the tables of a variant """
+XERI_ONLY: tuple = ("policy", "linear")
+
+
+def sample_position(symbols: tuple, top: Optional[int], rng: random.Random) -> Optional[list]:
+    """
+    Random cards matching the decision point. Returns [hand, other hand,
+    pile, deck, seat, shown] or None when the symbols can't be dealt from
+    one deck. `shown` are the cards already out of the game.
+    """
+    free = list(range(NUMBER_OF_CARDS))
+    rng.shuffle(free)
+    faces = [s // SEEN for s in symbols]
+    counts = {s // SEEN: s % SEEN for s in symbols}
+    if len(counts) != len(set(symbols)):
+        return None
+    if top is not None:
+        """ The card on the table was shown too """
+        if counts.get(top, 1) == 0:
+            return None
+        counts[top] = counts.get(top, 1) - 1
+
+    def take(face: int) -> Optional[int]:
+        for i, card in enumerate(free):
+            if card % 13 == face:
+                return free.pop(i)
+        return None
+
+    hand = [take(face) for face in faces]
+    pile = [] if top is None else [take(top)]
+    shown = [take(face) for face, count in counts.items() for i in range(count)]
+    if None in hand or None in pile or None in shown:
+        return None
+    """ Seat 1 answers with one card more than seat 0 has left """
+    seat = rng.randrange(2)
+    other = [free.pop() for i in range(len(faces) - seat)]
+    rounds = rng.randrange(min(3, len(free) // (2 * Xeri.HAND_SIZE)) + 1)
+    deck = free[:rounds * 2 * Xeri.HAND_SIZE]
+    return [hand, other, pile, deck, seat, shown]
+
+
+def start(position: list) -> Xeri:
+    hand, other, pile, deck, seat, shown = position
+    game = Xeri()
+    game.setup([list(hand), list(other)] if seat == 0 else [list(other), list(hand)], list(pile), list(deck), seat)
+    for gone in shown:
+        game.seen[gone % 13] += 1
+    return game
+
+
+def evaluate(position: list, card: int, rollout: Strategy) -> int:
+    """ Points over the opponent after playing `card` and finishing the game with `rollout` """
+    seat = position[4]
+    game = start(position)
+    game.play(game.hands[seat].index(card))
+    while not game.is_over():
+        turn = game.turn
+        game.play(rollout.choose(game.hands[turn], game))
+    totals = game.totals()
+    return totals[seat] - totals[1 - seat]
+
+
+def best_play(symbols: tuple, top: Optional[int], samples: int, seed: int) -> int:
+    """
+    The greedy play unless another face beats it on the same sampled
+    positions by more than `SIGNIFICANCE` standard errors.
+    """
+    rng = random.Random(seed)
+    position = sample_position(symbols, top, rng)
+    if position is None:
+        return UNKNOWN
+    candidates = sorted(set(s // SEEN for s in symbols))
+    rollout = GreedyStrategy()
+    greedy = position[0][rollout.choose(position[0], start(position))] % 13
+    if len(candidates) == 1:
+        return greedy
+    sums = [0] * len(candidates)
+    squares = [0] * len(candidates)
+    for i in range(samples):
+        position = sample_position(symbols, top, rng)
+        values = []
+        for face in candidates:
+            card = min((c for c in position[0] if c % 13 == face), key=lambda c: CARD_POINTS[c])
+            values.append(evaluate(position, card, rollout))
+        base = values[candidates.index(greedy)]
+        for j, value in enumerate(values):
+            sums[j] += value - base
+            squares[j] += (value - base) ** 2
+    best = greedy
+    best_mean = 0.0
+    for j, face in enumerate(candidates):
+        mean = sums[j] / samples
+        error = math.sqrt(max(0.0, squares[j] / samples - mean * mean) / samples)
+        if mean > best_mean and mean > SIGNIFICANCE * error:
+            best = face
+            best_mean = mean
+    return best
+
+
+def build_slot(slot: int, max_hand: int, samples: int, seed: int) -> bytes:
+    """ Every hand for one face on the table (or the empty table) """
+    top = None if slot == EMPTY else slot
+    offsets = hand_offsets(max_hand)
+    entries = bytearray(offsets[-1])
+    for size in range(1, max_hand + 1):
+        for symbols in itertools.combinations_with_replacement(range(SYMBOLS), size):
+            i = offsets[size] + rank(symbols)
+            entries[i] = best_play(symbols, top, samples, seed + i)
+    return bytes(entries)
+
+
+def build(filename: str, max_hand: int, samples: int, seed: int, workers: Optional[int] = None) -> None:
+    """ The game imports this module at startup and never builds, so multiprocessing is loaded here """
+    from concurrent.futures import ProcessPoolExecutor
+    with ProcessPoolExecutor(workers) as pool:
+        slots = list(pool.map(build_slot, range(TOP_SLOTS), [max_hand] * TOP_SLOTS,
+                              [samples] * TOP_SLOTS, [seed + s * 1000003 for s in range(TOP_SLOTS)]))
+    with open(filename, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, max_hand))
+        for entries in slots:
+            f.write(entries)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Build the Cpu policy lookup table")
+    parser.add_argument("--output", default=POLICY_FILE)
+    parser.add_argument("--max-hand", type=int, default=2, help="largest hand in the table, 1 to 6")
+    parser.add_argument("--samples", type=int, default=100, help="simulated positions per decision")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    args = parser.parse_args()
+    if not 1 <= args.max_hand <= Xeri.HAND_SIZE:
+        parser.error("--max-hand must be between 1 and {}".format(Xeri.HAND_SIZE))
+    build(args.output, args.max_hand, args.samples, args.seed, args.workers)
+    print("{} entries in {}".format(TOP_SLOTS * hand_offsets(args.max_hand)[-1], args.output))
+
+
+if __name__ == "__main__":
+    main()
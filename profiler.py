@@ -0,0 +1,100 @@
+"""
+Per frame timing split in phases. Pure python, so the numbers can be
+collected by anything that runs a frame loop.
+"""
+import csv
+import json
+import time
+from array import array
+
+EVENTS = "events"
+UPDATE = "update"
+RENDER = "render"
+PRESENT = "present"
+PHASES: tuple = (EVENTS, UPDATE, RENDER, PRESENT)
+
+
+def percentile(values: list, p: float) -> float:
+    if len(values) == 0:
+        return 0.0
+    ordered = sorted(values)
+    index = min(len(ordered) - 1, int(round(p / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+class SampleWindow(object):
+    """
+    The last `size` samples in a preallocated array, written in place so
+    a full window costs nothing per frame. Iterates in no particular order.
+    """
+    def __init__(self, size: int):
+        self.__values = array("d", bytes(8 * size))
+        self.__count: int = 0
+        self.last: float = 0.0
+
+    def append(self, value: float) -> None:
+        self.__values[self.__count % len(self.__values)] = value
+        self.__count += 1
+        self.last = value
+
+    def __len__(self) -> int:
+        return min(self.__count, len(self.__values))
+
+    def __iter__(self):
+        return iter(self.__values[:len(self)])
+
+
+class FrameProfiler(object):
+    WINDOW = 240
+
+    def __init__(self, trace: bool = False):
+        self.samples: dict = {phase: SampleWindow(self.WINDOW) for phase in PHASES}
+        self.frames: SampleWindow = SampleWindow(self.WINDOW)
+        self.trace: list = [] if trace else None
+        self.blits: int = 0
+        self.state: str = ""
+        """ Time of each phase in the current frame, zeroed in place by `begin` """
+        self.__current: dict = dict.fromkeys(PHASES, 0.0)
+        self.__mark: float = time.perf_counter()
+        self.__start: float = self.__mark
+
+    def begin(self) -> None:
+        self.__start = self.__mark = time.perf_counter()
+        for phase in PHASES:
+            self.__current[phase] = 0.0
+
+    def mark(self, phase: str) -> None:
+        """ Time spent since the previous mark is booked to `phase` """
+        now = time.perf_counter()
+        self.__current[phase] = self.__current.get(phase, 0.0) + now - self.__mark
+        self.__mark = now
+
+    def end(self, state: str, blits: int) -> None:
+        total = time.perf_counter() - self.__start
+        for phase in PHASES:
+            self.samples[phase].append(self.__current[phase])
+        self.frames.append(total)
+        self.blits = blits
+        self.state = state
+        if self.trace is not None:
+            self.trace.append(
+                [state, blits, total] + [self.__current.get(phase, 0.0) for phase in PHASES]
+            )
+        self.begin()
+
+    def percentiles(self, phase: str, points: tuple = (50, 95, 99)) -> list:
+        values = list(self.samples[phase])
+        return [percentile(values, p) for p in points]
+
+    def export(self, filename: str) -> None:
+        """ Writes the trace as CSV when the file ends with .csv, JSON otherwise """
+        header = ["state", "blits", "frame"] + list(PHASES)
+        rows = self.trace or []
+        if filename.endswith(".csv"):
+            with open(filename, "w", newline="") as f:
+                writer = csv.writer(f)
+                writer.writerow(header)
+                writer.writerows(rows)
+            return
+        with open(filename, "w") as f:
+            json.dump({"columns": header, "frames": rows}, f)
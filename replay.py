@@ -0,0 +1,167 @@
+"""
+Records the input of `main.App` and plays it back headless and as fast
+as possible. The frame times of the recording are fed to `Game.update`,
+so a replay goes through exactly the same states as the session.
+"""
+import argparse
+import json
+import os
+import time
+from typing import Optional
+from pygame import joystick
+from pygame.event import Event
+from pygame.locals import QUIT, KEYUP, KEYDOWN, MOUSEMOTION, MOUSEBUTTONUP, \
+    JOYBUTTONDOWN, JOYBUTTONUP, JOYHATMOTION, JOYAXISMOTION, JOYDEVICEADDED, JOYDEVICEREMOVED
+from main import App
+
+EVENT_TYPES: dict = {
+    QUIT: (),
+    KEYUP: ("key", "mod"),
+    KEYDOWN: ("key", "mod"),
+    MOUSEMOTION: ("pos",),
+    MOUSEBUTTONUP: ("pos", "button"),
+    JOYBUTTONDOWN: ("instance_id", "button"),
+    JOYBUTTONUP: ("instance_id", "button"),
+    JOYHATMOTION: ("instance_id", "hat", "value"),
+    JOYAXISMOTION: ("instance_id", "axis", "value"),
+    JOYDEVICEADDED: ("device_index", "instance_id"),
+    JOYDEVICEREMOVED: ("instance_id",),
+}
+""" Kept while loading, a replay needs the joypad before its first input """
+DEVICE_EVENTS: tuple = (JOYDEVICEADDED, JOYDEVICEREMOVED)
+
+
+class EventRecorder(object):
+    def __init__(self, seed: Optional[int], strategy: str = "simple", variant: str = "xeri", players: int = 2,
+                 decks: int = 1, partnership: bool = False):
+        self.seed = seed
+        self.strategy = strategy
+        self.variant = variant
+        self.players = players
+        self.decks = decks
+        self.partnership = partnership
+        self.frames: list = []
+        self.__held: list = []
+
+    def hold(self, events: list) -> None:
+        """ Input while loading is not recorded, but a joypad plugged meanwhile goes to the next frame """
+        self.__held.extend(self.encode(e) for e in events if e.type in DEVICE_EVENTS)
+
+    def record(self, time: int, events: list) -> None:
+        self.frames.append([time, self.__held + [self.encode(e) for e in events if e.type in EVENT_TYPES]])
+        self.__held = []
+
+    def encode(self, event: Event) -> list:
+        if event.type == JOYDEVICEADDED:
+            """ The event has no instance id, the joypad is not opened on replay and needs it """
+            return [event.type, event.device_index, joystick.Joystick(event.device_index).get_instance_id()]
+        return [event.type] + [getattr(event, name) for name in EVENT_TYPES[event.type]]
+
+    def save(self, filename: str) -> None:
+        with open(filename, "w") as f:
+            json.dump({"seed": self.seed, "strategy": self.strategy, "variant": self.variant, "players": self.players,
+                       "decks": self.decks, "partnership": self.partnership, "frames": self.frames},
+                      f, separators=(',', ':'))
+
+
+class Recording(object):
+    def __init__(self, filename: str):
+        with open(filename) as f:
+            data = json.load(f)
+        self.seed: Optional[int] = data["seed"]
+        self.strategy: str = data.get("strategy", "simple")
+        self.variant: str = data.get("variant", "xeri")
+        self.players: int = data.get("players", 2)
+        self.decks: int = data.get("decks", 1)
+        self.partnership: bool = data.get("partnership", False)
+        self.frames: list = data["frames"]
+
+    def duration(self) -> int:
+        return sum(frame[0] for frame in self.frames)
+
+
+def decode(data: list) -> Event:
+    names = EVENT_TYPES[data[0]]
+    """ JSON has no tuples, `pos` and the hat `value` were saved as lists """
+    attributes = {name: tuple(value) if isinstance(value, list) else value for name, value in zip(names, data[1:])}
+    return Event(data[0], attributes)
+
+
+class ReplayApp(App):
+    """
+    Runs a recording without `clock.tick`, rendering is optional. An
+    exception is reported with the frame it happened on.
+    """
+    def __init__(self, recording: Recording, render: bool = True):
+        super().__init__(seed=recording.seed)
+        self.background = False
+        self.strategy = recording.strategy
+        self.variant = recording.variant
+        self.players = recording.players
+        self.decks = recording.decks
+        self.partnership = recording.partnership
+        self.recording = recording
+        self.render = render
+        self.frame: int = 0
+
+    def on_execute(self) -> None:
+        if self.on_init() is False:
+            return
+        try:
+            for frame_time, events in self.recording.frames:
+                for data in events:
+                    self.on_event(decode(data))
+                self.on_loop(frame_time)
+                if self.render:
+                    self.on_render()
+                self.frame += 1
+                if self.running is False:
+                    break
+        except Exception:
+            print("Replay failed on frame {}".format(self.frame))
+            raise
+        finally:
+            self.on_cleanup()
+
+
+def replay(filename: str, render: bool = True, capture: Optional[str] = None,
+           capture_fps: Optional[float] = None, events: Optional[str] = None) -> dict:
+    """
+    With `capture` every frame is rendered and encoded, the replay waits
+    for the encoder. `events` is a .csv or .jsonl file for the game events.
+    """
+    recording = Recording(filename)
+    app = ReplayApp(recording, render or capture is not None)
+    app.capture = capture
+    app.capture_fps = capture_fps
+    app.events = events
+    app.capture_block = True
+    start = time.perf_counter()
+    app.on_execute()
+    elapsed = time.perf_counter() - start
+    return {
+        "frames": app.frame,
+        "seconds": elapsed,
+        "frames_per_sec": app.frame / elapsed,
+        "speedup": recording.duration() / 1000 / elapsed,
+    }
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Replay a session recorded with main.py --record")
+    parser.add_argument("file")
+    parser.add_argument("--no-render", action="store_true")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--capture", metavar="PATH", help="render the replay to a PNG directory or a .gif file")
+    parser.add_argument("--capture-fps", type=float, help="frames per second to capture, 25 for a .gif")
+    parser.add_argument("--events", metavar="FILE", help="write the game events to a .csv or .jsonl file")
+    args = parser.parse_args()
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+    for i in range(args.repeat):
+        result = replay(args.file, not args.no_render, args.capture, args.capture_fps, args.events)
+        print(" ".join("{}={}".format(k, round(v, 3) if isinstance(v, float) else v) for k, v in result.items()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,370 @@
+"""
+Xeri rules without any pygame dependency.
+Cards are plain integers (suite * 13 + face) in the same order
+`DeckOfCards.build` creates its sprites, so a seeded deal is identical
+in both worlds. A game with more decks repeats the same integers, so
+every table indexed by card stays 52 entries long.
+"""
+import random
+from typing import Optional
+
+FACES: list = ["Ace", "Deuce", "Three", "Four", "Five",
+               "Six", "Seven", "Eight", "Nine", "Ten", "Jack", "Queen", "King"]
+SUITES: list = ["Spades", "Hearts", "Clubs", "Diamonds"]
+JACK = "Jack"
+JACK_FACE = 10
+SPADES = 0
+CLUBS = 2
+DIAMONDS = 3
+NUMBER_OF_CARDS = 52
+
+MOST_CARDS_POINTS = 3
+MOST_CLUBS_POINTS = 1
+XERI_POINTS = 10
+JACK_XERI_POINTS = 20
+
+
+def face_of(card: int) -> str:
+    return FACES[card % 13]
+
+
+def suite_of(card: int) -> str:
+    return SUITES[card // 13]
+
+
+def table_cards(table_size: int, players: int, decks: int = 1) -> int:
+    """ Cards dealt to the table on the first round, enough more that the rest deals evenly to the seats """
+    return table_size + (NUMBER_OF_CARDS * decks - table_size) % players
+
+
+class Rules(object):
+    """
+    A variant compiled to flat tables, so the engine pays one lookup per
+    move whatever the variant. Tables indexed by `top_face * 13 + face`:
+    `capture` whether `face` takes the pile topped by `top_face` and
+    `bonus` the points for taking a single card that way.
+    """
+    def __init__(self, name: str, hand_size: int, table_size: int, capture: bytes, bonus: tuple,
+                 card_points: tuple, most_cards: int, most_suite: int, most_suite_points: int):
+        self.name = name
+        self.hand_size = hand_size
+        self.table_size = table_size
+        self.capture = capture
+        self.bonus = bonus
+        self.card_points = card_points
+        self.most_cards = most_cards
+        self.most_suite = most_suite
+        self.most_suite_points = most_suite_points
+        """ Faces that take any card, played only when they capture by the strategies """
+        self.sweeps: tuple = tuple(all(capture[top * 13 + face] for top in range(13)) for face in range(13))
+
+    def captures(self, top: Optional[int], card: int) -> bool:
+        """ `top` is the card on top of the table, None when it is empty """
+        return top is not None and self.capture[top % 13 * 13 + card % 13] == 1
+
+
+def compile_rules(name: str, spec: dict) -> Rules:
+    """
+    `spec` keys: hand, table, pairs (same face captures), sweeps (faces
+    capturing anything), bonus and face_bonus (a pair on a single card),
+    face_points and card_points ((suite, face): points), most_cards and
+    most_suite ((suite, points)).
+    """
+    capture = bytearray(13 * 13)
+    bonus = [0] * (13 * 13)
+    for top in range(13):
+        for face in range(13):
+            pair = spec["pairs"] and face == top
+            if pair or face in spec["sweeps"]:
+                capture[top * 13 + face] = 1
+            if pair:
+                bonus[top * 13 + face] = spec["face_bonus"].get(face, spec["bonus"])
+    points = [spec["face_points"].get(card % 13, 0) for card in range(NUMBER_OF_CARDS)]
+    for (suite, face), value in spec["card_points"].items():
+        points[suite * 13 + face] = value
+    suite, suite_points = spec["most_suite"]
+    return Rules(name, spec["hand"], spec["table"], bytes(capture), tuple(bonus), tuple(points),
+                 spec["most_cards"], suite, suite_points)
+
+
+""" Pairs and fishing by the top card only: Bastra as played with a Pişti scoring, Cassino without sums and builds """
+VARIANT_SPECS: dict = {
+    "xeri": {
+        "hand": 6, "table": 4, "pairs": True, "sweeps": (JACK_FACE,),
+        "bonus": XERI_POINTS, "face_bonus": {JACK_FACE: JACK_XERI_POINTS},
+        "face_points": {9: 1, 10: 1, 11: 1, 12: 1}, "card_points": {(DIAMONDS, 9): 2, (CLUBS, 1): 1},
+        "most_cards": MOST_CARDS_POINTS, "most_suite": (CLUBS, MOST_CLUBS_POINTS),
+    },
+    "bastra": {
+        "hand": 4, "table": 4, "pairs": True, "sweeps": (JACK_FACE,),
+        "bonus": 10, "face_bonus": {JACK_FACE: 20},
+        "face_points": {0: 1, 10: 1}, "card_points": {(DIAMONDS, 9): 3, (CLUBS, 1): 2},
+        "most_cards": 3, "most_suite": (CLUBS, 0),
+    },
+    "cassino": {
+        "hand": 4, "table": 4, "pairs": True, "sweeps": (),
+        "bonus": 0, "face_bonus": {},
+        "face_points": {0: 1}, "card_points": {(DIAMONDS, 9): 2, (SPADES, 1): 1},
+        "most_cards": 3, "most_suite": (SPADES, 1),
+    },
+}
+VARIANTS: dict = {name: compile_rules(name, spec) for name, spec in VARIANT_SPECS.items()}
+XERI: Rules = VARIANTS["xeri"]
+""" Points of every card in Xeri, indexed like the deck """
+CARD_POINTS: list = list(XERI.card_points)
+
+
+class Score(object):
+    """
+    Kept up to date on every captured card, so the totals never need a
+    recount. The majority bonuses depend on the opponent and are added by
+    `total`.
+    """
+    def __init__(self, rules: Rules = XERI):
+        self.rules = rules
+        self.reset()
+
+    def reset(self) -> None:
+        self.cards: int = 0
+        """ Cards of the majority suite, clubs in Xeri """
+        self.clubs: int = 0
+        self.points: int = 0
+        self.xeri: int = 0
+        self.jack_xeri: int = 0
+
+    def add(self, card: int) -> None:
+        self.cards += 1
+        if card // 13 == self.rules.most_suite:
+            self.clubs += 1
+        self.points += self.rules.card_points[card]
+
+    def add_xeri(self, points: int, jack: bool) -> None:
+        if jack:
+            self.jack_xeri += 1
+        else:
+            self.xeri += 1
+        self.points += points
+
+    def total(self, *others: 'Score') -> int:
+        """ A majority bonus needs more than every other team """
+        total = self.points
+        if all(self.cards > other.cards for other in others):
+            total += self.rules.most_cards
+        if all(self.clubs > other.clubs for other in others):
+            total += self.rules.most_suite_points
+        return total
+
+
+class Strategy(object):
+    """
+    Picks a card from the public view of a game, given by `rules.Xeri` in
+    simulations and by `cards.Table` on screen:
+    `top()` the card on top of the table or None, `pile_size()` the cards
+    on the table, `seen` how many cards of each face were shown and
+    `rules` the variant played.
+    """
+    def __init__(self):
+        raise RuntimeError("Can not instatiate")
+
+    def choose(self, hand: list, game: 'Xeri') -> int:
+        """ Return the position in `hand` of the card to play """
+        raise NotImplementedError("Implement `choose` method.")
+
+
+class SimpleStrategy(Strategy):
+    """
+    The first card that captures, otherwise the first card on hand.
+    """
+    def __init__(self):
+        pass
+
+    def choose(self, hand: list, game: 'Xeri') -> int:
+        top = game.top()
+        if top is None:
+            return 0
+        for i, card in enumerate(hand):
+            if game.rules.captures(top, card):
+                return i
+        return 0
+
+
+class RandomStrategy(Strategy):
+    def __init__(self, seed: Optional[int] = None):
+        self.random = random.Random(seed)
+
+    def choose(self, hand: list, game: 'Xeri') -> int:
+        return self.random.randrange(len(hand))
+
+
+class GreedyStrategy(Strategy):
+    """
+    Captures with the same face before using a Jack (any sweeping face),
+    keeps Jacks for piles worth it, and otherwise throws the face most
+    likely to be dead.
+    """
+    JACK_PILE = 3
+
+    def __init__(self):
+        pass
+
+    def choose(self, hand: list, game: 'Xeri') -> int:
+        rules = game.rules
+        points = rules.card_points
+        top = game.top()
+        jack = None
+        if top is not None:
+            pre = top % 13
+            for i, card in enumerate(hand):
+                face = card % 13
+                if face == pre and rules.capture[pre * 13 + face] == 1:
+                    return i
+                if rules.sweeps[face] and jack is None:
+                    jack = i
+            if jack is not None and (game.pile_size() >= self.JACK_PILE or points[top] > 0):
+                return jack
+        best = None
+        best_key = None
+        for i, card in enumerate(hand):
+            face = card % 13
+            if rules.sweeps[face]:
+                continue
+            """ Faces shown or held are less likely to be captured """
+            known = game.seen[face]
+            for other in hand:
+                if other % 13 == face:
+                    known += 1
+            key = (known, -points[card])
+            if best_key is None or key > best_key:
+                best = i
+                best_key = key
+        if best is None:
+            return 0
+        return best
+
+
+STRATEGIES: dict = {
+    "simple": SimpleStrategy,
+    "greedy": GreedyStrategy,
+    "random": RandomStrategy,
+}
+
+
+class Xeri(object):
+    """
+    A game following the deal and turn order of `game.*State`: each round
+    deals up to six cards to every hand, the first one also four to the
+    table, seat 0 always leads and the turn goes round the seats. With
+    `partnership` seats facing each other play as a team, seat % teams.
+    Scores, captures and xeri are kept per team. Another variant of
+    `VARIANTS` changes the tables, not the code path.
+    """
+    HAND_SIZE = XERI.hand_size
+    TABLE_SIZE = XERI.table_size
+
+    def __init__(self, seed: Optional[int] = None, rules: Rules = XERI, players: int = 2, decks: int = 1,
+                 partnership: bool = False):
+        if partnership and players % 2 == 1:
+            raise ValueError("A partnership needs an even number of players")
+        self.rules = rules
+        self.players = players
+        self.decks = decks
+        self.partnership = partnership
+        self.reset(seed)
+
+    def reset(self, seed: Optional[int] = None) -> None:
+        self.seed = seed
+        deck = list(range(NUMBER_OF_CARDS)) * self.decks
+        random.Random(seed).shuffle(deck)
+        self.setup([[] for i in range(self.players)], [], deck)
+        self.__deal()
+        for i in range(table_cards(self.rules.table_size, self.players, self.decks)):
+            card = self.deck.pop()
+            self.pile.append(card)
+            self.seen[card % 13] += 1
+
+    def setup(self, hands: list, pile: list, deck: list, turn: int = 0) -> None:
+        """ Continue from a given position instead of a new deal, one hand per seat """
+        self.deck: list = deck
+        self.hands: list = hands
+        self.pile: list = pile
+        self.teams: int = len(hands) // 2 if self.partnership else len(hands)
+        self.captures: list = [[] for i in range(self.teams)]
+        self.xeri: list = [0] * self.teams
+        self.scores: list = [Score(self.rules) for i in range(self.teams)]
+        self.turn: int = turn
+        self.last_capturer: Optional[int] = None
+        self.moves: int = 0
+        """ Cards left on all hands, so the end of a round is not a scan of the seats """
+        self.on_hands: int = sum(len(hand) for hand in hands)
+        self.seen: list = [0] * 13
+        for card in pile:
+            self.seen[card % 13] += 1
+
+    def __deal(self) -> None:
+        """ The last rounds of a deck deal fewer cards, the same to every seat """
+        size = min(self.rules.hand_size, len(self.deck) // len(self.hands))
+        for hand in self.hands:
+            for i in range(size):
+                hand.append(self.deck.pop())
+        self.on_hands += size * len(self.hands)
+
+    def team(self, seat: int) -> int:
+        return seat % self.teams
+
+    def top(self) -> Optional[int]:
+        if len(self.pile) == 0:
+            return None
+        return self.pile[-1]
+
+    def pile_size(self) -> int:
+        return len(self.pile)
+
+    def is_over(self) -> bool:
+        return len(self.deck) == 0 and self.on_hands == 0
+
+    def play(self, index: int) -> tuple:
+        """
+        Play the card at `index` of the current seat's hand.
+        Returns (card, captured, xeri).
+        """
+        seat = self.turn
+        card = self.hands[seat].pop(index)
+        face = card % 13
+        captured = False
+        bonus = 0
+        if len(self.pile) > 0:
+            i = self.pile[-1] % 13 * 13 + face
+            captured = self.rules.capture[i] == 1
+            if len(self.pile) == 1:
+                bonus = self.rules.bonus[i]
+        xeri = bonus > 0
+        self.pile.append(card)
+        self.seen[face] += 1
+        if captured:
+            team = seat % self.teams
+            self.collect(team)
+            self.last_capturer = team
+            if xeri:
+                self.xeri[team] += 1
+                self.scores[team].add_xeri(bonus, face == JACK_FACE)
+        self.moves += 1
+        self.on_hands -= 1
+        self.turn = (seat + 1) % len(self.hands)
+        if self.on_hands == 0:
+            if len(self.deck) > 0:
+                self.__deal()
+            elif self.last_capturer is not None:
+                self.collect(self.last_capturer)
+        return card, captured, xeri
+
+    def collect(self, team: int) -> None:
+        score = self.scores[team]
+        for card in self.pile:
+            score.add(card)
+        self.captures[team].extend(self.pile)
+        self.pile = []
+
+    def totals(self) -> list:
+        """ One total per team, per seat without a partnership """
+        scores = self.scores
+        return [score.total(*(other for other in scores if other is not score)) for score in scores]
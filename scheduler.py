@@ -0,0 +1,71 @@
+"""
+Delayed and repeating callbacks on the game clock. Timers are kept in a
+heap by due time, so a frame only pays for the timers that are due and
+the loop can ask how long it may sleep.
+"""
+import heapq
+import itertools
+from typing import Callable, Optional
+
+
+class Timer(object):
+    """ Handle of a scheduled callback, `cancel` it to drop the callback """
+    def __init__(self, due: int, callback: Callable, interval: Optional[int] = None):
+        self.due: int = due
+        self.callback: Callable = callback
+        self.interval: Optional[int] = interval
+        self.cancelled: bool = False
+
+    def cancel(self) -> None:
+        self.cancelled = True
+
+
+class Scheduler(object):
+    def __init__(self):
+        self.now: int = 0
+        self.__heap: list = []
+        """ Breaks ties of the same due time in the order the timers were added """
+        self.__order = itertools.count()
+
+    def after(self, delay: int, callback: Callable) -> Timer:
+        """ Calls `callback` once, `delay` ms from now """
+        return self.__push(Timer(self.now + delay, callback))
+
+    def every(self, interval: int, callback: Callable) -> Timer:
+        """ Calls `callback` every `interval` ms, the first time `interval` ms from now """
+        if interval <= 0:
+            raise ValueError("The interval must be positive")
+        return self.__push(Timer(self.now + interval, callback, interval))
+
+    def __push(self, timer: Timer) -> Timer:
+        heapq.heappush(self.__heap, (timer.due, next(self.__order), timer))
+        return timer
+
+    def advance(self, time: int) -> int:
+        """ Moves the clock by `time` ms and runs the due callbacks, returns how many ran """
+        self.now += time
+        ran = 0
+        heap = self.__heap
+        while len(heap) > 0 and heap[0][0] <= self.now:
+            timer = heapq.heappop(heap)[2]
+            if timer.cancelled:
+                continue
+            if timer.interval is not None:
+                """ A long frame runs a repeating timer once, not once per missed interval """
+                timer.due = max(timer.due + timer.interval, self.now + 1)
+                self.__push(timer)
+            timer.callback()
+            ran += 1
+        return ran
+
+    def next_wakeup(self) -> Optional[int]:
+        """ Milliseconds until the next timer is due, None when nothing is scheduled """
+        heap = self.__heap
+        while len(heap) > 0 and heap[0][2].cancelled:
+            heapq.heappop(heap)
+        if len(heap) == 0:
+            return None
+        return max(0, heap[0][0] - self.now)
+
+    def __len__(self) -> int:
+        return sum(1 for entry in self.__heap if not entry[2].cancelled)
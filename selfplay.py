@@ -0,0 +1,265 @@
+"""
+Batched self-play over the Xeri rules in NumPy and a linear policy
+gradient trainer for `policy.LinearStrategy`.
+
+Every game of a batch deals the same number of cards and seat 0 leads
+every round, so all of them move in lockstep: one `step` plays one card
+in each game for the seat on turn, and the batch is done after 48 steps.
+
+    python selfplay.py --games 1024 --updates 8000 --rate 2.0
+    python tournament.py linear greedy
+"""
+import argparse
+import json
+import time
+from typing import Optional
+import numpy
+from rules import CARD_POINTS, CLUBS, JACK_FACE, JACK_XERI_POINTS, MOST_CARDS_POINTS, MOST_CLUBS_POINTS, \
+    NUMBER_OF_CARDS, XERI_POINTS, Xeri
+from policy import FEATURES, LINEAR_FILE
+
+POINTS = numpy.array(CARD_POINTS, numpy.int16)
+HAND_SIZE = Xeri.HAND_SIZE
+TABLE_SIZE = Xeri.TABLE_SIZE
+MOVES = NUMBER_OF_CARDS - TABLE_SIZE
+
+
+class XeriEnv(object):
+    """
+    `reset` and `step` return the view of the seat on turn, fixed size
+    arrays over the `n` games:
+    hand (n, 6) cards or -1 for played slots, top (n,) card or -1,
+    pile (n,) cards on the table and seen (n, 13) cards shown per face.
+    The reward is the change of the point difference for the seat that
+    moved, including the majority bonuses, so it sums to the final result.
+    """
+    def __init__(self, n: int, seed: Optional[int] = None):
+        self.n = n
+        self.rng = numpy.random.default_rng(seed)
+        self.reset()
+
+    def reset(self, decks: Optional[numpy.ndarray] = None) -> dict:
+        """ `decks` (n, 52) deal like `rules.Xeri`, from the end; shuffled when not given """
+        n = self.n
+        if decks is None:
+            decks = self.rng.permuted(numpy.tile(numpy.arange(NUMBER_OF_CARDS, dtype=numpy.int8), (n, 1)), axis=1)
+        self.decks = numpy.asarray(decks, numpy.int8)
+        self.remaining = NUMBER_OF_CARDS
+        self.hands = numpy.full((n, 2, HAND_SIZE), -1, numpy.int8)
+        self.top = numpy.full(n, -1, numpy.int8)
+        self.pile = numpy.zeros(n, numpy.int16)
+        self.pile_points = numpy.zeros(n, numpy.int16)
+        self.pile_clubs = numpy.zeros(n, numpy.int16)
+        self.points = numpy.zeros((n, 2), numpy.int16)
+        self.cards = numpy.zeros((n, 2), numpy.int16)
+        self.clubs = numpy.zeros((n, 2), numpy.int16)
+        self.last_capturer = numpy.full(n, -1, numpy.int8)
+        self.seen = numpy.zeros((n, 13), numpy.int8)
+        self.turn = 0
+        self.moves = 0
+        self.rows = numpy.arange(n)
+        self.__deal()
+        table = self.__pop(TABLE_SIZE)
+        for i in range(TABLE_SIZE):
+            self.__to_pile(table[:, i])
+        return self.observe()
+
+    def __pop(self, count: int) -> numpy.ndarray:
+        """ The next `count` cards in the order `list.pop` takes them """
+        cards = self.decks[:, self.remaining - count:self.remaining][:, ::-1]
+        self.remaining -= count
+        return cards
+
+    def __deal(self) -> None:
+        for seat in range(2):
+            self.hands[:, seat] = self.__pop(HAND_SIZE)
+
+    def __to_pile(self, cards: numpy.ndarray) -> None:
+        self.top = cards.copy()
+        self.pile += 1
+        self.pile_points += POINTS[cards]
+        self.pile_clubs += cards // 13 == CLUBS
+        self.seen[self.rows, cards % 13] += 1
+
+    def __collect(self, mask: numpy.ndarray, seats: numpy.ndarray) -> None:
+        rows = self.rows[mask]
+        seats = seats[mask]
+        self.points[rows, seats] += self.pile_points[mask]
+        self.cards[rows, seats] += self.pile[mask]
+        self.clubs[rows, seats] += self.pile_clubs[mask]
+        self.pile[mask] = 0
+        self.pile_points[mask] = 0
+        self.pile_clubs[mask] = 0
+        self.top[mask] = -1
+
+    def difference(self) -> numpy.ndarray:
+        """ Total of seat 0 minus total of seat 1, as `rules.Score.total` counts it """
+        difference = self.points[:, 0].astype(numpy.int32) - self.points[:, 1]
+        difference += MOST_CARDS_POINTS * numpy.sign(self.cards[:, 0] - self.cards[:, 1])
+        difference += MOST_CLUBS_POINTS * numpy.sign(self.clubs[:, 0] - self.clubs[:, 1])
+        return difference
+
+    def observe(self) -> dict:
+        return {
+            "hand": self.hands[:, self.turn].copy(),
+            "top": self.top.copy(),
+            "pile": self.pile.copy(),
+            "seen": self.seen.copy(),
+        }
+
+    def legal(self) -> numpy.ndarray:
+        return self.hands[:, self.turn] >= 0
+
+    def is_over(self) -> bool:
+        return self.moves == MOVES
+
+    def step(self, actions: numpy.ndarray) -> tuple:
+        """ Plays the hand slot `actions` in every game. Returns (observation, reward, done) """
+        seat = self.turn
+        before = self.difference()
+        cards = self.hands[self.rows, seat, actions]
+        if (cards < 0).any():
+            raise ValueError("Played an empty hand slot")
+        self.hands[self.rows, seat, actions] = -1
+        faces = cards % 13
+        tops = self.top % 13
+        same = (self.top >= 0) & (faces == tops)
+        captured = same | ((self.top >= 0) & (faces == JACK_FACE))
+        xeri = same & (self.pile == 1)
+        self.__to_pile(cards)
+        self.points[:, seat] += numpy.where(xeri, numpy.where(faces == JACK_FACE, JACK_XERI_POINTS, XERI_POINTS), 0)
+        self.__collect(captured, numpy.full(self.n, seat))
+        self.last_capturer[captured] = seat
+        self.moves += 1
+        self.turn = 1 - seat
+        if self.moves % (2 * HAND_SIZE) == 0:
+            if self.remaining > 0:
+                self.__deal()
+            else:
+                self.__collect(self.last_capturer >= 0, self.last_capturer.astype(numpy.intp))
+        reward = self.difference() - before
+        if seat == 1:
+            reward = -reward
+        return self.observe(), reward, numpy.full(self.n, self.is_over())
+
+
+def features(observation: dict) -> numpy.ndarray:
+    """ (n, 6, len(FEATURES)) `policy.card_features` of every hand slot """
+    hand = observation["hand"].astype(numpy.int16)
+    top = observation["top"].astype(numpy.int16)[:, None]
+    pile = observation["pile"][:, None]
+    seen = observation["seen"]
+    faces = hand % 13
+    has_top = top >= 0
+    same = has_top & (faces == top % 13)
+    capture = same | (has_top & (faces == JACK_FACE))
+    valid = hand >= 0
+    pair = (faces[:, :, None] == faces[:, None, :]) & valid[:, None, :]
+    points = numpy.where(valid, POINTS[hand], 0)
+    jack = faces == JACK_FACE
+    result = numpy.stack([
+        capture,
+        same,
+        same & (pile == 1),
+        jack,
+        numpy.where(capture, pile / 10, 0.0),
+        numpy.where(capture, POINTS[top % NUMBER_OF_CARDS], 0),
+        points,
+        numpy.where(capture, 0.0, numpy.take_along_axis(seen, faces, 1) / 4),
+        numpy.where(capture, 0.0, (pair.sum(axis=2) - 1) / 3),
+        jack & ~capture,
+        numpy.where(has_top, 0, points),
+    ], axis=2).astype(numpy.float32)
+    return numpy.where(valid[:, :, None], result, 0.0)
+
+
+def probabilities(weights: numpy.ndarray, phi: numpy.ndarray, legal: numpy.ndarray) -> numpy.ndarray:
+    logits = phi @ weights
+    logits = numpy.where(legal, logits, -numpy.inf)
+    logits -= logits.max(axis=1, keepdims=True)
+    exp = numpy.exp(logits)
+    return exp / exp.sum(axis=1, keepdims=True)
+
+
+def sample(rng: numpy.random.Generator, p: numpy.ndarray) -> numpy.ndarray:
+    return (p.cumsum(axis=1) > rng.random((len(p), 1))).argmax(axis=1)
+
+
+def train(env: XeriEnv, updates: int, rate: float = 1.0, seed: Optional[int] = None,
+          weights: Optional[numpy.ndarray] = None, log=None) -> numpy.ndarray:
+    """
+    REINFORCE with both seats on the same softmax policy. The return of a
+    move is what its seat gains from it to the end, the baseline is the
+    mean return of the step over the batch.
+    """
+    rng = numpy.random.default_rng(seed)
+    weights = numpy.zeros(len(FEATURES)) if weights is None else weights
+    for update in range(updates):
+        observation = env.reset()
+        grads = []
+        rewards = []
+        while not env.is_over():
+            phi = features(observation)
+            legal = env.legal()
+            p = probabilities(weights, phi, legal)
+            actions = sample(rng, p)
+            grads.append(phi[env.rows, actions] - (p[:, :, None] * phi).sum(axis=1))
+            observation, reward, done = env.step(actions)
+            rewards.append(reward)
+        """ Seats alternate, so a later reward counts against the mover every other step """
+        returns = numpy.zeros((len(rewards), env.n))
+        following = numpy.zeros(env.n)
+        for t in range(len(rewards) - 1, -1, -1):
+            following = rewards[t] - following
+            returns[t] = following
+        advantage = returns - returns.mean(axis=1, keepdims=True)
+        advantage /= advantage.std() + 1e-8
+        gradient = (advantage[:, :, None] * numpy.array(grads)).mean(axis=(0, 1))
+        weights = weights + rate * gradient
+        if log is not None:
+            log(update, weights)
+    return weights
+
+
+def steps_per_second(n: int, steps: int = 480, seed: int = 0) -> float:
+    """ Env steps (one move in one game) per second, playing the first legal slot """
+    env = XeriEnv(n, seed)
+    start = time.perf_counter()
+    for i in range(steps):
+        if env.is_over():
+            env.reset()
+        env.step(env.legal().argmax(axis=1))
+    return n * steps / (time.perf_counter() - start)
+
+
+def export(weights: numpy.ndarray, filename: str = LINEAR_FILE) -> None:
+    with open(filename, "w") as f:
+        json.dump({"features": list(FEATURES), "weights": [round(float(w), 6) for w in weights]}, f, indent=2)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Self-play training of the linear Cpu strategy")
+    parser.add_argument("--games", type=int, default=1024, help="games per batch")
+    parser.add_argument("--updates", type=int, default=8000)
+    parser.add_argument("--rate", type=float, default=2.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output", default=LINEAR_FILE)
+    parser.add_argument("--benchmark", action="store_true", help="only report env steps/sec")
+    args = parser.parse_args()
+    if args.benchmark:
+        for n in (1, 64, 1024):
+            print("{:>6} games: {:>12.0f} steps/s".format(n, steps_per_second(n)))
+        return
+
+    def log(update: int, weights: numpy.ndarray) -> None:
+        if update % 50 == 0 or update == args.updates - 1:
+            print("{:>5} {}".format(update, " ".join("{}={:+.2f}".format(name, w)
+                                                     for name, w in zip(FEATURES, weights))))
+
+    weights = train(XeriEnv(args.games, args.seed), args.updates, args.rate, args.seed, log=log)
+    export(weights, args.output)
+    print("weights written to " + args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,187 @@
+"""
+Hosts many Xeri tables in one asyncio process, without pygame.
+
+Line delimited JSON over TCP, one table per connection:
+
+    client -> {"op": "join", "seed": 42}        seed is optional
+    client -> {"op": "play", "card": 17}
+    client -> {"op": "leave"}
+    server -> {"op": "joined", "table": 1, "seed": 42, "seat": 0}
+    server -> {"op": "turn", "hand": [...], "top": 3}
+    server -> {"op": "played", "seat": 1, "card": 5, "capture": false, "xeri": false}
+    server -> {"op": "over", "captured": [30, 22], "xeri": [1, 0], "scores": [25, 9]}
+    server -> {"op": "error", "reason": "..."}
+
+The client sits on seat 0, seat 1 is played by the server.
+"""
+import asyncio
+import argparse
+import json
+import logging
+import random
+from typing import Optional
+from rules import Xeri, SimpleStrategy, Strategy
+
+LOG = logging.getLogger("server")
+
+
+def encode(message: dict) -> bytes:
+    return json.dumps(message, separators=(',', ':')).encode() + b"\n"
+
+
+class TableSession(object):
+    """
+    One game driven by its own task. Moves are queued with a bounded
+    queue, so a slow table stops reading from its socket instead of
+    buffering without limit.
+    """
+    QUEUE_SIZE = 4
+
+    def __init__(self, id: int, seed: int, writer: asyncio.StreamWriter, strategy: Strategy):
+        self.id = id
+        self.game = Xeri(seed)
+        self.writer = writer
+        self.strategy = strategy
+        self.queue: asyncio.Queue = asyncio.Queue(self.QUEUE_SIZE)
+        self.task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        self.task = asyncio.create_task(self.run())
+        self.task.add_done_callback(self.report)
+
+    async def run(self) -> None:
+        self.send_turn()
+        await self.writer.drain()
+        while not self.game.is_over():
+            card = await self.queue.get()
+            hand = self.game.hands[0]
+            if self.game.turn != 0 or card not in hand:
+                self.send({"op": "error", "reason": "invalid card"})
+                await self.writer.drain()
+                continue
+            self.move(hand.index(card))
+            if not self.game.is_over():
+                self.move(self.strategy.choose(self.game.hands[1], self.game))
+            if self.game.is_over():
+                self.send({
+                    "op": "over",
+                    "captured": [len(c) for c in self.game.captures],
+                    "xeri": self.game.xeri,
+                    "scores": self.game.totals()
+                })
+            else:
+                self.send_turn()
+            await self.writer.drain()
+
+    def move(self, index: int) -> None:
+        seat = self.game.turn
+        card, captured, xeri = self.game.play(index)
+        self.send({"op": "played", "seat": seat, "card": card, "capture": captured, "xeri": xeri})
+
+    def send_turn(self) -> None:
+        self.send({"op": "turn", "hand": self.game.hands[0], "top": self.game.top()})
+
+    def send(self, message: dict) -> None:
+        self.writer.write(encode(message))
+
+    def is_finished(self) -> bool:
+        return self.task is not None and self.task.done()
+
+    async def stop(self) -> None:
+        if self.task is None or self.task.done():
+            return
+        self.task.cancel()
+        try:
+            await self.task
+        except (asyncio.CancelledError, Exception):
+            """ Logged by `report` """
+            pass
+
+    def report(self, task: asyncio.Task) -> None:
+        """ The error of a table that failed is logged, a client that went away is not an error """
+        if task.cancelled():
+            return
+        error = task.exception()
+        if error is not None and not isinstance(error, ConnectionError):
+            LOG.error("Table %d failed", self.id, exc_info=error)
+
+
+class Server(object):
+    MAX_TABLES = 10000
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 7777, max_tables: int = MAX_TABLES):
+        self.host = host
+        self.port = port
+        self.max_tables = max_tables
+        self.strategy: Strategy = SimpleStrategy()
+        self.tables: dict = {}
+        self.__next_id = 0
+        self.__server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> None:
+        self.__server = await asyncio.start_server(self.handle, self.host, self.port)
+        self.port = self.__server.sockets[0].getsockname()[1]
+
+    async def serve_forever(self) -> None:
+        await self.start()
+        async with self.__server:
+            await self.__server.serve_forever()
+
+    async def close(self) -> None:
+        self.__server.close()
+        await self.__server.wait_closed()
+
+    async def handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        session: Optional[TableSession] = None
+        try:
+            async for line in reader:
+                try:
+                    message = json.loads(line)
+                    op = message["op"]
+                except (ValueError, KeyError, TypeError):
+                    writer.write(encode({"op": "error", "reason": "bad message"}))
+                    continue
+                if op == "join" and session is None:
+                    session = self.join(message.get("seed"), writer)
+                    if session is None:
+                        writer.write(encode({"op": "error", "reason": "server full"}))
+                        break
+                elif op == "play" and session is not None and not session.is_finished():
+                    await session.queue.put(message.get("card"))
+                elif op == "leave":
+                    break
+                else:
+                    writer.write(encode({"op": "error", "reason": "unexpected " + str(op)}))
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            if session is not None:
+                await session.stop()
+                del self.tables[session.id]
+            writer.close()
+
+    def join(self, seed: Optional[int], writer: asyncio.StreamWriter) -> Optional[TableSession]:
+        if len(self.tables) >= self.max_tables:
+            return None
+        self.__next_id += 1
+        if seed is None:
+            seed = random.getrandbits(32)
+        session = TableSession(self.__next_id, seed, writer, self.strategy)
+        self.tables[session.id] = session
+        writer.write(encode({"op": "joined", "table": session.id, "seed": seed, "seat": 0}))
+        session.start()
+        return session
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Xeri table server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=7777)
+    parser.add_argument("--max-tables", type=int, default=Server.MAX_TABLES)
+    args = parser.parse_args()
+    server = Server(args.host, args.port, args.max_tables)
+    asyncio.run(server.serve_forever())
+
+
+if __name__ == "__main__":
+    main()
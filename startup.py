@@ -0,0 +1,93 @@
+"""
+Cold start profiling for `main.py --profile-startup`.
+
+Imports are timed by wrapping `builtins.__import__`, the other steps are
+marked with `phase`, which costs nothing when no profiler is installed.
+"""
+import builtins
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+""" Milliseconds from the first import to the first frame """
+STARTUP_BUDGET = 1000
+
+
+class StartupProfiler(object):
+    def __init__(self):
+        self.start: float = time.perf_counter()
+        self.imports: list = []
+        self.phases: list = []
+        self.marks: list = []
+        self.__import = builtins.__import__
+        self.__depth: int = 0
+        self.__lock = threading.Lock()
+
+    def install(self) -> None:
+        builtins.__import__ = self.__timed_import
+
+    def uninstall(self) -> None:
+        builtins.__import__ = self.__import
+
+    def __timed_import(self, name, *args, **kwargs):
+        if name in sys.modules or threading.current_thread() is not threading.main_thread():
+            return self.__import(name, *args, **kwargs)
+        entry = [self.__depth, name, 0.0]
+        self.imports.append(entry)
+        self.__depth += 1
+        start = time.perf_counter()
+        try:
+            return self.__import(name, *args, **kwargs)
+        finally:
+            entry[2] = time.perf_counter() - start
+            self.__depth -= 1
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            end = time.perf_counter()
+            with self.__lock:
+                self.phases.append((name, start - self.start, end - start))
+
+    def mark(self, name: str) -> float:
+        """ Milliseconds since the profiler was installed """
+        elapsed = (time.perf_counter() - self.start) * 1000
+        self.marks.append((name, elapsed))
+        return elapsed
+
+    def report(self, min_ms: float = 1.0, max_depth: int = 1) -> str:
+        lines = ["imports (cumulative ms)"]
+        for depth, name, seconds in self.imports:
+            if depth <= max_depth and seconds * 1000 >= min_ms:
+                lines.append("  {:>8.1f}  {}{}".format(seconds * 1000, "  " * depth, name))
+        lines.append("phases (start ms, duration ms)")
+        for name, start, seconds in sorted(self.phases, key=lambda p: p[1]):
+            lines.append("  {:>8.1f}  {:>8.1f}  {}".format(start * 1000, seconds * 1000, name))
+        lines.append("marks (ms)")
+        for name, elapsed in self.marks:
+            lines.append("  {:>8.1f}  {}".format(elapsed, name))
+        return "\n".join(lines)
+
+
+PROFILER: Optional[StartupProfiler] = None
+
+
+def install() -> StartupProfiler:
+    global PROFILER
+    PROFILER = StartupProfiler()
+    PROFILER.install()
+    return PROFILER
+
+
+@contextmanager
+def phase(name: str):
+    if PROFILER is None:
+        yield
+        return
+    with PROFILER.phase(name):
+        yield
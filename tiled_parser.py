@@ -1,4 +1,10 @@
+import base64
+import gzip
 import json
+import sys
+import zlib
+from array import array
+from xml.etree.ElementTree import iterparse
 from pygame import Rect
 from typing import Optional
 
@@ -19,30 +25,37 @@ class TileItem(object):
         return self.__type
 
 
+def scale_rect(x: float, y: float, width: float, height: float, scale: float) -> Rect:
+    return Rect(round(x * scale), round(y * scale), round(width * scale), round(height * scale))
+
+
 class TileLayer(object):
+    """ `config` is a layer as Tiled exports it to JSON, with `data` or, on infinite maps, `chunks` """
     def __init__(self, name: str, config: dict, tile: Rect):
         self.__items = []
         self.width = int(config['width'] * tile.width)
         self.height = int(config['height'] * tile.height)
         self.__name: str = name
-        self.__properties: str = self.__parse_type(config['properties'])
-        x: int = 0
-        y: int = 0
-        index: int = 0
-        for item in config['data']:
-            if item != 0:
-                index += 1
-                rect = Rect(x * tile.width,
-                            y * tile.height,
-                            tile.width,
-                            tile.height)
-                self.__items.append(
-                    TileItem(rect, item, self.get_type())
-                )
-            x += 1
-            if x > config['width'] - 1:
-                x = 0
-                y += 1
+        self.__properties: str = self.__parse_type(config.get('properties', []))
+        chunks = config.get('chunks')
+        if chunks is None:
+            chunks = [{'x': 0, 'y': 0, 'width': config['width'], 'data': config['data']}]
+        for chunk in chunks:
+            x: int = 0
+            y: int = 0
+            for item in chunk['data']:
+                if item != 0:
+                    rect = Rect((chunk['x'] + x) * tile.width,
+                                (chunk['y'] + y) * tile.height,
+                                tile.width,
+                                tile.height)
+                    self.__items.append(
+                        TileItem(rect, item, self.get_type())
+                    )
+                x += 1
+                if x > chunk['width'] - 1:
+                    x = 0
+                    y += 1
 
     def get_name(self) -> str:
         return self.__name
@@ -67,13 +80,14 @@ class TileLayer(object):
 
 
 class ObjectGroup(object):
-    def __init__(self, config: dict):
+    def __init__(self, config: dict, scale: float = 1):
         self.__items: list = []
         self.__name: str = config['name']
+        self.__scale = scale
         for item in config['objects']:
             if item['visible'] is False:
                 continue
-            rect = Rect(item['x'], item['y'], item['width'], item['height'])
+            rect = scale_rect(item['x'], item['y'], item['width'], item['height'], scale)
             self.__items.append(TileItem(rect, item['id'], item['type']))
 
     def get_items(self) -> list:
@@ -91,6 +105,9 @@ class ObjectGroup(object):
     def get_type(self) -> str:
         return 'object'
 
+    def get_scale(self) -> float:
+        return self.__scale
+
     def is_actor(self) -> bool:
         return False
 
@@ -124,22 +141,178 @@ class Map(object):
         return Rect(0, 0, self.width, self.height)
 
 
+def decode_tiles(text: str, encoding: Optional[str], compression: Optional[str]) -> list:
+    """ Global tile ids of a TMX <data> or <chunk> in CSV or base64, raw, zlib or gzip compressed """
+    if encoding == 'csv':
+        return [int(gid) for gid in text.replace('\n', '').split(',') if gid.strip() != '']
+    if encoding != 'base64':
+        raise ValueError("Unsupported tile encoding: {}".format(encoding))
+    data = base64.b64decode(text.strip())
+    if compression == 'zlib':
+        data = zlib.decompress(data)
+    elif compression == 'gzip':
+        data = gzip.decompress(data)
+    elif compression:
+        raise ValueError("Unsupported tile compression: {}".format(compression))
+    tiles = array('I')
+    tiles.frombytes(data)
+    if sys.byteorder == 'big':
+        tiles.byteswap()
+    return tiles.tolist()
+
+
+def parse_value(value: Optional[str], ptype: Optional[str]):
+    if ptype == 'bool':
+        return value == 'true'
+    if ptype == 'int' or ptype == 'object':
+        return int(value)
+    if ptype == 'float':
+        return float(value)
+    return value
+
+
+LAYER_TAGS: tuple = ('layer', 'objectgroup')
+LAYER_PARENTS: tuple = ('map', 'group')
+
+
+class TmxParser(object):
+    """
+    Reads a .tmx file with `iterparse`. Every layer is turned into the
+    config `TileLayer` and `ObjectGroup` take from JSON as soon as its
+    element ends, and every element that ends is cleared and removed from
+    its parent, so the document is never held as a whole.
+    """
+    def __init__(self, file: str, scale: float = 1):
+        self.__map: Map = None
+        self.__scale = scale
+        self.__tile: Rect = None
+        layer: Optional[dict] = None
+        data: Optional[dict] = None
+        properties: list = []
+        path: list = []
+        """ The open elements, a child is removed from its parent once it ends """
+        elements: list = []
+        for event, element in iterparse(file, ('start', 'end')):
+            tag = element.tag
+            if event == 'start':
+                """ Tilesets have object groups too, layers are children of the map or of a group """
+                is_layer = len(path) > 0 and path[-1] in LAYER_PARENTS
+                path.append(tag)
+                elements.append(element)
+                if tag == 'map':
+                    self.__start_map(element.attrib)
+                elif tag == 'layer' and is_layer:
+                    layer = self.__attributes(element.attrib, 'tilelayer')
+                    properties = layer['properties']
+                elif tag == 'objectgroup' and is_layer:
+                    layer = self.__attributes(element.attrib, 'objectgroup')
+                    layer['objects'] = []
+                    properties = layer['properties']
+                elif tag == 'data' and layer is not None:
+                    data = element.attrib
+                    layer['data'] = []
+                    if layer['infinite']:
+                        layer['chunks'] = []
+                continue
+            path.pop()
+            elements.pop()
+            is_layer = len(path) > 0 and path[-1] in LAYER_PARENTS
+            if tag == 'property' and layer is not None and path[-1] == 'properties' and path[-2] in LAYER_TAGS:
+                properties.append({
+                    'name': element.get('name'),
+                    'type': element.get('type', 'string'),
+                    'value': parse_value(element.get('value', element.text), element.get('type')),
+                })
+            elif tag == 'tile' and data is not None:
+                layer['data'].append(int(element.get('gid', 0)))
+            elif tag == 'chunk' and data is not None:
+                chunk = {name: int(element.get(name)) for name in ('x', 'y', 'width', 'height')}
+                chunk['data'] = self.__tiles(element, data, layer)
+                layer['chunks'].append(chunk)
+            elif tag == 'data':
+                if not layer['infinite']:
+                    layer['data'] = self.__tiles(element, data, layer)
+                data = None
+            elif tag == 'object' and layer is not None and path[-1] == 'objectgroup':
+                layer['objects'].append(self.__object(element.attrib))
+            elif tag in LAYER_TAGS and is_layer:
+                if layer['visible']:
+                    self.__add_layer(layer)
+                layer = None
+            """ Only the open elements stay in memory """
+            element.clear()
+            if len(elements) > 0:
+                elements[-1].remove(element)
+
+    def __start_map(self, attributes: dict) -> None:
+        self.__infinite = attributes.get('infinite') == '1'
+        tile_width = int(attributes['tilewidth'])
+        tile_height = int(attributes['tileheight'])
+        width = round(int(attributes['width']) * tile_width * self.__scale)
+        height = round(int(attributes['height']) * tile_height * self.__scale)
+        self.__map = Map(width, height)
+        self.__tile = scale_rect(0, 0, tile_width, tile_height, self.__scale)
+
+    def __attributes(self, attributes: dict, ltype: str) -> dict:
+        return {
+            'name': attributes.get('name', ''),
+            'type': ltype,
+            'visible': attributes.get('visible', '1') == '1',
+            'width': int(attributes.get('width', 0)),
+            'height': int(attributes.get('height', 0)),
+            'infinite': self.__infinite,
+            'properties': [],
+        }
+
+    def __tiles(self, element, data: dict, layer: dict) -> list:
+        if data.get('encoding') is None:
+            tiles = layer['data']
+            layer['data'] = []
+            return tiles
+        return decode_tiles(element.text or '', data.get('encoding'), data.get('compression'))
+
+    def __object(self, attributes: dict) -> dict:
+        return {
+            'id': int(attributes['id']),
+            'name': attributes.get('name', ''),
+            'type': attributes.get('type', attributes.get('class', '')),
+            'visible': attributes.get('visible', '1') == '1',
+            'x': float(attributes.get('x', 0)),
+            'y': float(attributes.get('y', 0)),
+            'width': float(attributes.get('width', 0)),
+            'height': float(attributes.get('height', 0)),
+        }
+
+    def __add_layer(self, layer: dict) -> None:
+        if layer['type'] == 'tilelayer':
+            self.__map.add_layer(TileLayer(layer['name'], layer, self.__tile))
+        else:
+            self.__map.add_layer(ObjectGroup(layer, self.__scale))
+
+    def get_map(self) -> Map:
+        return self.__map
+
+
 class TiledParser(object):
-    def __init__(self, file: str):
+    """ `scale` multiplies every coordinate of the map, .tmx files are read by `TmxParser` """
+    def __init__(self, file: str, scale: float = 1):
         self.layers = []
+        if file.endswith('.tmx'):
+            self.__map = TmxParser(file, scale).get_map()
+            return
         with open(file) as f:
             data = json.load(f)
-        width = data['width'] * data['tilewidth']
-        height = data['height'] * data['tileheight']
+        width = round(data['width'] * data['tilewidth'] * scale)
+        height = round(data['height'] * data['tileheight'] * scale)
         self.__map = Map(width, height)
-        tile = Rect(0, 0, data['tilewidth'], data['tileheight'])
+        tile = scale_rect(0, 0, data['tilewidth'], data['tileheight'], scale)
         for layer in data['layers']:
             if layer['visible'] is False:
                 continue
             if layer['type'] == 'tilelayer':
                 self.__map.add_layer(TileLayer(layer['name'], layer, tile))
             if layer['type'] == 'objectgroup':
-                self.__map.add_layer(ObjectGroup(layer))
+                self.__map.add_layer(ObjectGroup(layer, scale))
 
     def get_map(self) -> Map:
         return self.__map
@@ -0,0 +1,147 @@
+"""
+Round robin between `policy.STRATEGIES`. Every deal is played twice with
+the seats swapped, and a pairing stops as soon as a sequential
+probability ratio test decides which strategy is stronger.
+
+    python tournament.py greedy simple random --workers 4
+"""
+import argparse
+import itertools
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+from rules import VARIANTS, Xeri
+from policy import STRATEGIES, XERI_ONLY
+
+
+def play(strategies: list, seed: int, variant: str = "xeri") -> list:
+    """ Final totals of seat 0 and seat 1, `strategies` in seat order """
+    game = Xeri(seed, VARIANTS[variant])
+    while not game.is_over():
+        seat = game.turn
+        game.play(strategies[seat].choose(game.hands[seat], game))
+    return game.totals()
+
+
+def play_mirrored(a: str, b: str, seeds: range, variant: str = "xeri") -> list:
+    """
+    Point difference for `a` over both seatings of every seed, played in a
+    worker process. The strategies are built once, not for every deal.
+    """
+    strategy_a = STRATEGIES[a]()
+    strategy_b = STRATEGIES[b]()
+    results = []
+    for seed in seeds:
+        first = play([strategy_a, strategy_b], seed, variant)
+        second = play([strategy_b, strategy_a], seed, variant)
+        results.append(first[0] - first[1] + second[1] - second[0])
+    return results
+
+
+class Sprt(object):
+    """
+    Bernoulli SPRT on the deals won by `a`. H0: `a` wins p0 of the decided
+    deals, H1: p1. Ties carry no information and are only counted.
+    """
+    def __init__(self, delta: float = 0.05, alpha: float = 0.05, beta: float = 0.05):
+        self.p0 = 0.5 - delta
+        self.p1 = 0.5 + delta
+        self.lower = math.log(beta / (1 - alpha))
+        self.upper = math.log((1 - beta) / alpha)
+        self.win = math.log(self.p1 / self.p0)
+        self.loss = math.log((1 - self.p1) / (1 - self.p0))
+        self.wins = 0
+        self.losses = 0
+        self.ties = 0
+        self.points = 0
+        self.llr = 0.0
+
+    def add(self, difference: int) -> None:
+        self.points += difference
+        if difference > 0:
+            self.wins += 1
+            self.llr += self.win
+        elif difference < 0:
+            self.losses += 1
+            self.llr += self.loss
+        else:
+            self.ties += 1
+
+    def deals(self) -> int:
+        return self.wins + self.losses + self.ties
+
+    def decision(self) -> int:
+        """ 1 when `a` is stronger, -1 when `b` is, 0 while undecided """
+        if self.llr >= self.upper:
+            return 1
+        if self.llr <= self.lower:
+            return -1
+        return 0
+
+
+def run_pairing(pool: ProcessPoolExecutor, workers: int, a: str, b: str, sprt: Sprt,
+                batch: int, max_deals: int, first_seed: int = 0, variant: str = "xeri") -> Sprt:
+    """ Keeps every worker busy with batches of seeds until the test decides """
+    pending = set()
+    seed = first_seed
+    while True:
+        while len(pending) < workers * 2 and seed - first_seed < max_deals:
+            pending.add(pool.submit(play_mirrored, a, b, range(seed, seed + batch), variant))
+            seed += batch
+        if len(pending) == 0:
+            return sprt
+        done, pending = wait(pending, return_when=FIRST_COMPLETED)
+        for future in done:
+            for difference in future.result():
+                sprt.add(difference)
+                """ The test stops on the deal that decides it, not at the end of a batch """
+                if sprt.decision() != 0 or sprt.deals() >= max_deals:
+                    for other in pending:
+                        other.cancel()
+                    return sprt
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Round robin between Cpu strategies")
+    parser.add_argument("strategies", nargs="*",
+                        help="any of " + ", ".join(sorted(STRATEGIES)) + ", all that play the variant by default")
+    parser.add_argument("--variant", default="xeri", choices=sorted(VARIANTS), help="rules of the deals")
+    parser.add_argument("--workers", type=int, default=None, help="processes, all cores by default")
+    parser.add_argument("--batch", type=int, default=100, help="mirrored deals per task")
+    parser.add_argument("--max-deals", type=int, default=200000)
+    parser.add_argument("--delta", type=float, default=0.05, help="H0/H1 win rate 0.5 -/+ delta")
+    parser.add_argument("--alpha", type=float, default=0.05)
+    parser.add_argument("--beta", type=float, default=0.05)
+    args = parser.parse_args()
+    if not args.strategies:
+        args.strategies = [name for name in sorted(STRATEGIES) if args.variant == "xeri" or name not in XERI_ONLY]
+    for name in args.strategies:
+        if name not in STRATEGIES:
+            parser.error("unknown strategy " + name)
+        if args.variant != "xeri" and name in XERI_ONLY:
+            parser.error("{} plays only --variant xeri".format(name))
+
+    standings = {name: 0 for name in args.strategies}
+    with ProcessPoolExecutor(args.workers) as pool:
+        workers = args.workers or os.cpu_count() or 1
+        for a, b in itertools.combinations(args.strategies, 2):
+            sprt = run_pairing(pool, workers, a, b, Sprt(args.delta, args.alpha, args.beta),
+                               args.batch, args.max_deals, variant=args.variant)
+            decision = sprt.decision()
+            if decision == 1:
+                standings[a] += 1
+                verdict = a + " stronger"
+            elif decision == -1:
+                standings[b] += 1
+                verdict = b + " stronger"
+            else:
+                verdict = "undecided"
+            print("{} vs {}: {} deals, +{} -{} ={}, {:+.2f} points/deal, llr {:.2f}, {}".format(
+                a, b, sprt.deals(), sprt.wins, sprt.losses, sprt.ties,
+                sprt.points / max(1, sprt.deals()), sprt.llr, verdict))
+    for name, score in sorted(standings.items(), key=lambda s: -s[1]):
+        print("{:>10} {}".format(name, score))
+
+
+if __name__ == "__main__":
+    main()